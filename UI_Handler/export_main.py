@@ -1,6 +1,16 @@
-import deck
+import inspect
+import os
+import sys
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import AnyStr, Dict, List, Tuple, Optional
 
+import deck
+import load_file
+import save_file
+import card_downloader as cdl
 import mylogger
+from proxybuilder_types import ReadFuncTy, SaveFuncTy
 
 logger = mylogger.MAINLOGGER
 
@@ -11,3 +21,118 @@ def export_deck(settings):
     logger.info(verbose_msg=dck)
     dck.guarded_save(settings.output, settings.exportfunc)
 
+
+def stream_deck(settings):
+    """
+    Convert between `-` (stdin/stdout) and files. Line oriented formats are converted
+    row by row without building a deck.
+    """
+    log_stream = None
+    if settings.output == "-":
+        # keep stdout clean for the converted deck
+        log_stream = mylogger.logging_handler_out.setStream(sys.stderr)
+    try:
+        _stream_deck(settings)
+    finally:
+        if log_stream is not None:
+            mylogger.logging_handler_out.setStream(log_stream)
+
+
+def _stream_deck(settings):
+    infile = sys.stdin if settings.input == "-" else open(settings.input)
+    outstream = sys.stdout if settings.output == "-" else open(settings.output, 'w')
+    instream = infile
+    try:
+        readfunc = settings.readfunc
+        if readfunc is load_file.read_any_file:
+            iterfunc, readfunc, instream = load_file.sniff_stream(instream)
+        else:
+            iterfunc = load_file.find_line_iterator(readfunc)
+        name = "" if settings.output == "-" else os.path.splitext(os.path.basename(settings.output))[0]
+        line_processor = save_file.find_line_processor(settings.exportfunc, name)
+        if iterfunc is not None and line_processor is not None:
+            save_file.write_rows(outstream, iterfunc(instream), line_processor)
+        else:
+            dck = deck.Deck(name=name)
+            dck.load(instream, readfunc)
+            dck.save(outstream, settings.exportfunc)
+    finally:
+        if infile is not sys.stdin:
+            infile.close()
+        if outstream is not sys.stdout:
+            outstream.close()
+        else:
+            outstream.flush()
+
+
+def _bind_session(exportfunc: SaveFuncTy, session: cdl.CardDownloader) -> SaveFuncTy:
+    if "session" in inspect.signature(exportfunc).parameters:
+        return functools.partial(exportfunc, session=session)
+    return exportfunc
+
+
+def convert_file(input_fname: AnyStr, output_fname: AnyStr,
+                 readfunc: ReadFuncTy, exportfunc: SaveFuncTy) -> Optional[BaseException]:
+    try:
+        dck = deck.Deck()
+        with open(input_fname) as f:
+            dck.load(f, readfunc)
+        with open(output_fname, 'w') as f:
+            dck.save(f, exportfunc)
+    except Exception as e:
+        return e
+    logger.info(verbose_msg="Exported %s -> %s", verbose_args=(input_fname, output_fname))
+    return None
+
+
+def export_decks(settings):
+    os.makedirs(settings.output, exist_ok=True)
+    session = cdl.get_shared_downloader()
+    exportfunc = _bind_session(settings.exportfunc, session)
+    jobs = [(i, os.path.join(settings.output,
+                             os.path.splitext(os.path.basename(i))[0] + "." + settings.output_extension))
+            for i in settings.inputs]
+    total = len(jobs)
+    jobs, collisions = split_output_collisions(jobs)
+    logger.info("Exporting {0} decks to {1}...".format(len(jobs), settings.output))
+
+    def run(job: Tuple[str, str]) -> Optional[BaseException]:
+        return convert_file(job[0], job[1], settings.readfunc, exportfunc)
+
+    if settings.jobs > 1:
+        with ThreadPoolExecutor(max_workers=settings.jobs) as pool:
+            results = list(pool.map(run, jobs))
+        failures = [(i, e) for (i, o), e in zip(jobs, results) if e is not None]
+    else:
+        failures = [(i, e) for (i, o), e in ((job, run(job)) for job in jobs) if e is not None]
+    report_failures(collisions + failures, total)
+
+
+def split_output_collisions(jobs: List[Tuple[str, str]]) \
+        -> Tuple[List[Tuple[str, str]], List[Tuple[str, BaseException]]]:
+    """
+    Separate the jobs writing to an output file of their own from those sharing it
+    (e.g. `a.txt` and `a.csv`), which are not converted: one would overwrite the other.
+    """
+    inputs = {}  # type: Dict[str, List[str]]
+    for i, o in jobs:
+        inputs.setdefault(os.path.normcase(os.path.abspath(o)), []).append(i)
+    unique = []
+    collisions = []
+    for i, o in jobs:
+        same_output = inputs[os.path.normcase(os.path.abspath(o))]
+        if len(same_output) == 1:
+            unique.append((i, o))
+        else:
+            others = ", ".join(os.path.basename(f) for f in same_output if f != i)
+            collisions.append((i, FileExistsError("{0} is also the output of {1}".format(o, others))))
+    return unique, collisions
+
+
+def report_failures(failures: List[Tuple[str, BaseException]], total: int, action: str = "Exporting decks"):
+    if not failures:
+        logger.info("{0}, done! ({1} files)".format(action, total))
+        return
+    logger.error("{0} of {1} files failed:\n - {2}".format(
+        len(failures), total,
+        "\n - ".join("{0}: {1}".format(os.path.abspath(f), e) for f, e in failures)))
@@ -1,20 +1,37 @@
 import argparse
+import functools
+import glob
 import os
 import re
 import sys
+from typing import TextIO, Tuple, Union
 
 from . import export_main
+from . import profiling
 
 import load_file
 import mylogger
 import save_file
-from . import proxybuild_main
 from proxy import paper
+from proxy import layout
 from proxybuilder_types import SaveFuncTy, ReadFuncTy
 
 logger = mylogger.MAINLOGGER
 
 
+def card_size(value: str) -> Union[str, Tuple[float, float]]:
+    """
+    Card format name or image dimensions WxH (mm).
+    """
+    if value in layout.CARD_SIZES:
+        return value
+    mo = re.fullmatch(r"(\d+(?:\.\d+)?)x(\d+(?:\.\d+)?)", value)
+    if not mo:
+        raise argparse.ArgumentTypeError("unknown card size '{0}', use WxH (mm) or one of: {1}".format(
+            value, ", ".join(layout.CARD_SIZES)))
+    return float(mo[1]), float(mo[2])
+
+
 # noinspection PyAttributeOutsideInit
 class SetupData:
     def _make_normalized_path(self, other_path: str) -> str:
@@ -42,7 +59,10 @@ class SetupData:
             logger.verbose = True
         {
             "proxy": self.setup_proxy,
-            "export": self.setup_export
+            "export": self.setup_export,
+            "manifest": self.setup_manifest,
+            "serve": self.setup_serve,
+            "client": self.setup_client
         }.get(self.cmd)()
 
     @staticmethod
@@ -64,7 +84,8 @@ class SetupData:
         all_type_reverse_keys = {save_file.save_csv: ("csv", "deckbox"),
                                  save_file.save_txt: ("txt", "text", "plain"),
                                  save_file.save_xmage: ("xmage",),
-                                 save_file.save_json: ("json", "native", "full")}
+                                 save_file.save_json: ("json", "native", "full"),
+                                 save_file.save_compact_json: ("compact-json", "compact")}
         all_type_keys = {k: fun for fun, keys in all_type_reverse_keys.items() for k in keys}
         try:
             return all_type_keys[output_type]
@@ -81,12 +102,19 @@ class SetupData:
                     pass
         return save_file.save_txt
 
+    def _make_paper(self, name: str) -> paper.Paper:
+        margins = tuple(self.margins) if self.margins is not None else None
+        mo = re.fullmatch(r"(\d+(?:\.\d+)?)x(\d+(?:\.\d+)?)", name)
+        if mo:
+            return paper.Paper(width=float(mo[1]), height=float(mo[2]), margins=margins)
+        return paper.Paper(name=name, margins=margins)
+
     def setup_proxy(self):
         self.input = os.path.normpath(self.input)
         self.project_directory = os.path.dirname(self.input)
         if not os.path.isabs(self.output):
             self.output = self._make_normalized_path(self.output)
-        if self.inventory is not None and not os.path.isabs(self.inventory):
+        if self.inventory is not None:
             self.inventory = [i if os.path.isabs(i) else self._make_normalized_path(i)
                               for i in self.inventory.split(";")]
 
@@ -109,21 +137,95 @@ class SetupData:
         else:
             self.alldecks_readfunc = self.find_readfunc(self.alldecks_type)
 
-        mo = re.fullmatch(r"(\d+)x(\d+)", str(self.paper))
-        if mo:
-            self.paper = paper.Paper(width=mo[1], height=mo[2], margins=self.margins)
-        else:
-            self.paper = paper.Paper(name=str(self.paper), margins=self.margins)
+        self.paper = [self._make_paper(p) for p in str(self.paper).split(";")]
+        if isinstance(self.card_size, str):
+            # manifest entries are not parsed by argparse
+            try:
+                self.card_size = card_size(self.card_size)
+            except argparse.ArgumentTypeError as e:
+                raise ValueError(str(e))
+        # the proxy builder pulls in the downloader and template dependencies, only load it when needed
+        from . import proxybuild_main
         self.cmd = proxybuild_main.build_proxies
 
+    def setup_manifest(self):
+        from . import manifest_main
+        self.manifest = os.path.abspath(self.manifest)
+        entries = manifest_main.deck_entries(manifest_main.read_manifest(self.manifest),
+                                             os.path.dirname(self.manifest))
+        parser_proxy = argparse.ArgumentParser()
+        setup_proxy_parser(parser_proxy)
+        self.decks = []
+        for entry in entries:
+            deck_settings = parser_proxy.parse_args([entry["input"], entry["output"]])
+            unknown = set(entry) - set(vars(deck_settings))
+            if unknown:
+                raise ValueError("Unknown manifest options: {0}".format(", ".join(sorted(unknown))))
+            for k, v in entry.items():
+                setattr(deck_settings, k, v)
+            deck_settings.cmd = "proxy"
+            deck_settings.verbose = self.verbose
+            self.decks.append(SetupData(deck_settings))
+        self.cmd = manifest_main.build_manifest
+
+    @staticmethod
+    def find_export_extension(exportfunc: SaveFuncTy) -> str:
+        extensions = {save_file.save_csv: "csv",
+                      save_file.save_txt: "txt",
+                      save_file.save_xmage: "dck",
+                      save_file.save_json: "json",
+                      save_file.save_compact_json: "json"}
+        return extensions.get(exportfunc, "txt")
+
     def setup_export(self):
+        self.readfunc = self.find_readfunc(self.intype)
+        if self.input == "-" or self.output == "-":
+            self.setup_stream_export()
+            return
+        if os.path.isdir(self.input) or glob.has_magic(self.input):
+            self.setup_bulk_export()
+            return
         self.input = os.path.normpath(self.input)
+        self.project_directory = os.path.dirname(self.input)
         if not os.path.isabs(self.output):
             self.output = self._make_normalized_path(self.output)
-        self.readfunc = self.find_readfunc(self.intype)
         self.exportfunc = self.find_exportfunc(self.outtype, self.output)
         self.cmd = export_main.export_deck
 
+    def setup_stream_export(self):
+        for a in ("input", "output"):
+            if getattr(self, a) != "-":
+                setattr(self, a, os.path.abspath(getattr(self, a)))
+        self.exportfunc = self.find_exportfunc(self.outtype, "" if self.output == "-" else self.output)
+        self.cmd = export_main.stream_deck
+
+    def setup_bulk_export(self):
+        if os.path.isdir(self.input):
+            self.inputs = sorted(os.path.join(self.input, f) for f in os.listdir(self.input)
+                                 if os.path.isfile(os.path.join(self.input, f)))
+        else:
+            self.inputs = sorted(f for f in glob.glob(self.input) if os.path.isfile(f))
+        self.output = os.path.normpath(self.output)
+        self.exportfunc = self.find_exportfunc(self.outtype)
+        self.output_extension = self.find_export_extension(self.exportfunc)
+        self.cmd = export_main.export_decks
+
+    def _setup_endpoint(self):
+        from . import serve_main
+        if self.socket is None:
+            self.socket = serve_main.DEFAULT_SOCKET
+        return serve_main
+
+    def setup_serve(self):
+        self.make_parser = setup_parser
+        self.run_command = run_command
+        self.cmd = self._setup_endpoint().serve
+
+    def setup_client(self):
+        if self.job and self.job[0] == "--":
+            self.job = self.job[1:]
+        self.cmd = self._setup_endpoint().client
+
 
 class ArgumentParser(argparse.ArgumentParser):
     def _get_action_from_name(self, name):
@@ -149,8 +251,12 @@ class ArgumentParser(argparse.ArgumentParser):
             raise exc
         super(ArgumentParser, self).error(message)
 
-    def parse_args(self, *args, **kwargs):
-        r = super().parse_args(*args, **kwargs)
+    def parse_args(self, args=None, namespace=None):
+        if args is None:
+            args = sys.argv[1:]
+        # --profile takes an optional file name, which argparse would confuse with the sub command
+        args = ["--profile=" + profiling.DEFAULT_PROFILE if arg == "--profile" else arg for arg in args]
+        r = super().parse_args(args, namespace)
         return SetupData(r)
 
 
@@ -158,7 +264,7 @@ def setup_proxy_parser(parser_proxy: argparse.ArgumentParser):
     parser_proxy.add_argument("input",
                               help="Input deck filename")
     parser_proxy.add_argument("output",
-                              help="output latex file")
+                              help="output latex file, or pdf file (.pdf) to skip latex")
     parser_proxy.add_argument("-i", "--inventory",
                               help="Inventory filename")
     parser_proxy.add_argument("--alldecks",
@@ -175,12 +281,18 @@ def setup_proxy_parser(parser_proxy: argparse.ArgumentParser):
                               help="all other decks input type")
     parser_proxy.add_argument("-p", "--paper",
                               default='a4paper',
-                              help="Paper name or dimensions")
+                              help="Paper name or dimensions (mm), several candidates separated by ';' "
+                                   "to use the one needing the fewest sheets")
     parser_proxy.add_argument("-m", "--margins",
                               nargs=2,
                               type=float,
                               metavar=("horizontal", "vertical"),
                               help="margin dimensions (mm)")
+    parser_proxy.add_argument("--card-size",
+                              type=card_size,
+                              default="standard",
+                              help="Card format ({0}) or image dimensions (mm)".format(
+                                  ", ".join(layout.CARD_SIZES)))
     parser_proxy.add_argument("-c", "--cutthick",
                               type=float,
                               default=0,
@@ -193,6 +305,16 @@ def setup_proxy_parser(parser_proxy: argparse.ArgumentParser):
     parser_proxy.add_argument("--template",
                               default="template.tex",
                               help="template file")
+    parser_proxy.add_argument("--shard-pages",
+                              type=int,
+                              help="split the latex output in independent documents of this many pages, "
+                                   "joined by the output file")
+    parser_proxy.add_argument("--incremental",
+                              action="store_true",
+                              help="keep a build state next to the output and only redo what changed "
+                                   "since the previous build")
+    parser_proxy.add_argument("--report",
+                              help="write the timings and counters of the run to this json file")
     parser_proxy.add_argument("--specific-edition",
                               action="store_true",
                               help="Flag to indicate card edition is important for proxies")
@@ -203,13 +325,48 @@ def setup_proxy_parser(parser_proxy: argparse.ArgumentParser):
 
 def setup_export_parser(parser_export: argparse.ArgumentParser):
     parser_export.add_argument("input",
-                               help="Input deck filename")
+                               help="Input deck filename, directory or glob pattern ('-' for stdin)")
     parser_export.add_argument("output",
-                               help="output deck file")
+                               help="output deck file ('-' for stdout), "
+                                    "or output directory when converting several decks")
     parser_export.add_argument("--outtype",
                                help="output type")
     parser_export.add_argument("--intype",
                                help="Input type")
+    parser_export.add_argument("-j", "--jobs",
+                               type=int,
+                               default=1,
+                               help="number of decks converted in parallel")
+
+
+def setup_manifest_parser(parser_manifest: argparse.ArgumentParser):
+    parser_manifest.add_argument("manifest",
+                                 help="yaml or json file listing the decks, "
+                                      "with the proxy options shared by all decks and per deck")
+    parser_manifest.add_argument("-j", "--jobs",
+                                 type=int,
+                                 default=1,
+                                 help="number of decks rendered in parallel")
+    parser_manifest.add_argument("--report",
+                                 help="write the timings and counters of the run to this json file")
+
+
+def setup_endpoint_parser(parser_endpoint: argparse.ArgumentParser):
+    group = parser_endpoint.add_mutually_exclusive_group()
+    group.add_argument("--socket",
+                       help="unix socket of the job server")
+    group.add_argument("--port",
+                       type=int,
+                       help="local tcp port of the job server, instead of a unix socket. Clients "
+                            "authenticate with the token the server writes to a file only its user can read, "
+                            "mtg-proxybuilder-PORT.token in the temporary folder")
+
+
+def setup_client_parser(parser_client: argparse.ArgumentParser):
+    setup_endpoint_parser(parser_client)
+    parser_client.add_argument("job",
+                               nargs=argparse.REMAINDER,
+                               help="proxy or export command line run by the server")
 
 
 def setup_parser():
@@ -223,16 +380,105 @@ def setup_parser():
                                           help="export deck as new file")
     parser_export.set_defaults(cmd="export")
     setup_export_parser(parser_export)
+    parser_manifest = subparsers.add_parser("manifest",
+                                            help="create the proxies of several decks at once")
+    parser_manifest.set_defaults(cmd="manifest")
+    setup_manifest_parser(parser_manifest)
+    parser_serve = subparsers.add_parser("serve",
+                                         help="run proxy and export jobs sent by clients, "
+                                              "keeping sessions and caches warm")
+    parser_serve.set_defaults(cmd="serve")
+    setup_endpoint_parser(parser_serve)
+    parser_client = subparsers.add_parser("client",
+                                          help="send a job to a running server")
+    parser_client.set_defaults(cmd="client")
+    setup_client_parser(parser_client)
     parser.add_argument("-v", "--verbose",
                               action="store_true",
                               help="Verbose printing messages")
+    parser.add_argument("--profile",
+                        metavar="FILE",
+                        help="run under cProfile, write the statistics to FILE "
+                             "(a bare --profile writes {0}) and print the slowest functions. Only the "
+                             "main thread is profiled, not the downloads and renders of the worker "
+                             "threads".format(profiling.DEFAULT_PROFILE))
+    parser.add_argument("--profile-memory",
+                        action="store_true",
+                        help="trace allocations, print the peak memory use and the top allocation sites "
+                             "near the peak")
+    parser.add_argument("--metrics",
+                        metavar="FILE",
+                        help="write the downloader counters and latencies to FILE "
+                             "in the prometheus text format at the end of the run")
+    parser.add_argument("--source",
+                        metavar="URL",
+                        help="site the card pages and scans are downloaded from, "
+                             "e.g. a local stand-in (default: magiccards.info)")
+    parser.add_argument("--parse-processes",
+                        type=int,
+                        metavar="N",
+                        help="parse the card pages in N worker processes, "
+                             "so parsing is not serialized with the downloads (default: 0, parse in place)")
+    parser.add_argument("--log-queue",
+                        action="store_true",
+                        help="write log messages from a background thread")
+    parser.add_argument("--log-file",
+                        help="also write log messages as json lines to this file (implies --log-queue)")
     return parser
 
 
+# global options changing the state of the whole process, a job server only takes them when it starts
+PROCESS_OPTIONS = ("source", "parse_processes", "log_queue", "log_file")
+
+
+def setup_process(args):
+    """
+    Apply the process wide options: logging, the site downloaded from and the parsing processes.
+    """
+    if args.log_queue or args.log_file is not None:
+        mylogger.start_queue_logging(args.log_file)
+    if args.source is not None:
+        import card_downloader
+        card_downloader.DEFAULT_SOURCE = args.source.rstrip("/")
+    if args.parse_processes is not None:
+        import card_downloader
+        card_downloader.DEFAULT_PARSE_PROCESSES = args.parse_processes
+
+
+def run_command(args, out: TextIO = None, job: bool = False):
+    """
+    Run the sub command with the options applying to a single run: profiling and metrics.
+    The profiles are printed to `out`, stderr by default. A `job` run by a server can not
+    set the process wide options.
+    """
+    if job:
+        given = ["--" + o.replace("_", "-") for o in PROCESS_OPTIONS if getattr(args, o) not in (None, False)]
+        if given:
+            raise ValueError("{0} apply to the whole server, give them to serve".format(", ".join(given)))
+    run = args.cmd
+    if args.profile_memory:
+        run = functools.partial(profiling.run_memory_profiled, run, out=out)
+    if args.profile is not None:
+        run = functools.partial(profiling.run_profiled, run, fname=args.profile, out=out)
+    try:
+        run(args)
+    finally:
+        if args.metrics is not None:
+            import card_downloader
+            card_downloader.get_shared_downloader().metrics.save_prometheus(args.metrics)
+
+
 def main(a=None):
     parser = setup_parser()
     args = parser.parse_args(a)
-    args.cmd(args)
+    setup_process(args)
+    try:
+        run_command(args)
+    finally:
+        if args.parse_processes:
+            import card_downloader
+            card_downloader.get_shared_downloader().close()
+        mylogger.stop_queue_logging()
 
 
 if __name__ == "__main__":
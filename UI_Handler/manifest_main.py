@@ -0,0 +1,136 @@
+import json
+import os
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AnyStr, Dict, List, Optional, Tuple
+
+import deck
+import mylogger
+import runreport
+import proxy.image_downloader as imd
+import card_downloader as cdl
+from . import proxybuild_main
+from .export_main import report_failures
+from proxybuilder_types import ReadFuncTy
+
+logger = mylogger.MAINLOGGER
+
+# manifest entries holding paths, made relative to the manifest file
+PATH_KEYS = ("input", "output", "inventory", "alldecks", "figures", "template")
+# manifest entries accepting a list, joined like their command line counterpart
+LIST_KEYS = ("inventory", "alldecks", "paper")
+
+
+def read_manifest(fname: AnyStr) -> Dict[str, Any]:
+    with open(fname) as f:
+        if os.path.splitext(fname)[1].lower() in (".yaml", ".yml"):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError("{0}: reading yaml manifests requires PyYAML".format(fname))
+            manifest = yaml.safe_load(f)
+        else:
+            manifest = json.load(f)
+    if not isinstance(manifest, dict) or not isinstance(manifest.get("decks"), list):
+        raise ValueError("{0}: a manifest needs a 'decks' list".format(fname))
+    return manifest
+
+
+def _normalize_entry(entry: Dict[str, Any], base_directory: str) -> Dict[str, Any]:
+    entry = {k.replace("-", "_"): v for k, v in entry.items()}
+    for k in LIST_KEYS:
+        if isinstance(entry.get(k), (list, tuple)):
+            entry[k] = ";".join(map(str, entry[k]))
+    for k in PATH_KEYS:
+        if entry.get(k) is not None:
+            entry[k] = ";".join(p if os.path.isabs(p) else os.path.normpath(os.path.join(base_directory, p))
+                                for p in str(entry[k]).split(";"))
+    return entry
+
+
+def deck_entries(manifest: Dict[str, Any], base_directory: str) -> List[Dict[str, Any]]:
+    """
+    Options of every deck: the top level options of the manifest, overridden by
+    the options of the deck itself.
+    """
+    shared = {k: v for k, v in manifest.items() if k != "decks"}
+    # by default all decks share their images, so every card is only downloaded once
+    shared.setdefault("figures", "images/")
+    entries = []
+    for i, d in enumerate(manifest["decks"]):
+        if isinstance(d, str):
+            d = {"input": d}
+        entry = dict(shared, **d)
+        if "input" not in entry or "output" not in entry:
+            raise ValueError("deck {0} of the manifest needs an input and an output".format(i + 1))
+        entries.append(_normalize_entry(entry, base_directory))
+    return entries
+
+
+class DeckCache:
+    """
+    Loads every file once for all decks of the manifest.
+    """
+    def __init__(self):
+        self.decks = {}  # type: Dict[Tuple[str, ReadFuncTy], deck.Deck]
+        self.lock = threading.Lock()
+
+    def __call__(self, fname: AnyStr, readfunc: ReadFuncTy) -> deck.Deck:
+        key = (os.path.abspath(fname), readfunc)
+        with self.lock:
+            try:
+                return self.decks[key]
+            except KeyError:
+                pass
+            dck = proxybuild_main.load_deck(fname, readfunc)
+            self.decks[key] = dck
+            return dck
+
+
+def _known_images(states: List[Optional[Any]]) -> Optional[Dict]:
+    known = {}
+    for state in states:
+        if state is not None:
+            known.update(state.images)
+    return known or None
+
+
+def build_manifest(settings):
+    start_counters = proxybuild_main.start_report()
+    loader = DeckCache()
+    decks = [proxybuild_main.find_proxies(s, loader) for s in settings.decks]
+    states = [proxybuild_main.load_state(s, proxies) for s, (dck, proxies) in zip(settings.decks, decks)]
+
+    # every card is looked up once, whatever the number of decks needing it
+    session = cdl.get_shared_downloader()
+    image_fnames = {}  # type: Dict[str, Dict]
+    figure_dirs = sorted({s.figures for s in settings.decks})
+    for figures in figure_dirs:
+        needed = Counter()
+        for s, (dck, proxies) in zip(settings.decks, decks):
+            if s.figures == figures:
+                needed |= proxies.full_deck
+        image_fnames[figures] = imd.get_all_images(deck.Deck(needed), figures, session,
+                                                   known=_known_images(states))
+
+    logger.info("Rendering {0} decks...".format(len(settings.decks)))
+
+    def run(job) -> Optional[BaseException]:
+        s, (dck, proxies), state = job
+        try:
+            with runreport.stage("render"):
+                proxybuild_main.render_proxies(s, dck, proxies, image_fnames[s.figures], state)
+        except Exception as e:
+            return e
+        return None
+
+    jobs = list(zip(settings.decks, decks, states))
+    if settings.jobs > 1:
+        with ThreadPoolExecutor(max_workers=settings.jobs) as pool:
+            results = list(pool.map(run, jobs))
+    else:
+        results = [run(job) for job in jobs]
+    report_failures([(s.output, e) for s, e in zip(settings.decks, results) if e is not None], len(jobs),
+                    "Rendering decks")
+    proxybuild_main.finish_report(settings, start_counters)
@@ -0,0 +1,89 @@
+import io
+import sys
+import threading
+from typing import Any, Callable, List, TextIO
+
+DEFAULT_PROFILE = "proxybuilder.prof"
+
+
+def run_profiled(func: Callable[[Any], Any], args, fname: str = DEFAULT_PROFILE,
+                 top: int = 25, out: TextIO = None):
+    """
+    Run `func(args)` under cProfile, dump the statistics to `fname` (readable with pstats)
+    and print the functions with the largest cumulative time. Only the calling thread is
+    profiled, not the threads it starts.
+    """
+    import cProfile
+    import pstats
+    if out is None:
+        out = sys.stderr
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, args)
+    finally:
+        profiler.dump_stats(fname)
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(top)
+        print("Profile written to {0}".format(fname), file=out)
+        print(stream.getvalue(), file=out)
+
+
+def format_size(size: float) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if abs(size) < 1024:
+            return "{0:.1f} {1}".format(size, unit)
+        size /= 1024
+    return "{0:.1f} GiB".format(size)
+
+
+def run_memory_profiled(func: Callable[[Any], Any], args, top: int = 10, out: TextIO = None,
+                        interval: float = 0.05):
+    """
+    Run `func(args)` while tracing allocations, then print the peak memory use and the lines
+    holding the most memory near the peak. A thread samples the traced memory every `interval`
+    seconds and takes a snapshot whenever it reaches a new high, so the temporaries making the
+    peak show up even if they are freed by the end of the run. Snapshots are traced too, the one
+    kept is left out of the size compared.
+    """
+    import tracemalloc
+    if out is None:
+        out = sys.stderr
+    # traced size, size of the snapshot itself, snapshot
+    best = [0, 0, None]  # type: List[Any]
+    done = threading.Event()
+
+    def take_snapshot(size: int):
+        best[2] = None
+        before = tracemalloc.get_traced_memory()[0]
+        snapshot = tracemalloc.take_snapshot()
+        best[:] = [size, tracemalloc.get_traced_memory()[0] - before, snapshot]
+
+    def sample():
+        while not done.wait(interval):
+            size = tracemalloc.get_traced_memory()[0] - best[1]
+            if size > best[0] * 1.05:
+                take_snapshot(size)
+
+    tracemalloc.start()
+    sampler = threading.Thread(target=sample, name="memory sampler", daemon=True)
+    sampler.start()
+    try:
+        return func(args)
+    finally:
+        done.set()
+        sampler.join()
+        current, peak = tracemalloc.get_traced_memory()
+        current -= best[1]
+        if current >= best[0]:
+            take_snapshot(current)
+        tracemalloc.stop()
+        size, snapshot = best[0], best[2]
+        snapshot = snapshot.filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),))
+        print("Peak traced memory: {0} (still allocated: {1})".format(format_size(peak), format_size(current)),
+              file=out)
+        print("Top {0} allocation sites at the highest sample, {1} allocated:".format(top, format_size(size)),
+              file=out)
+        for stat in snapshot.statistics("lineno")[:top]:
+            frame = stat.traceback[0]
+            print("  {0}:{1}: {2} in {3} blocks".format(frame.filename, frame.lineno,
+                                                       format_size(stat.size), stat.count), file=out)
@@ -1,49 +1,94 @@
 import os
-from typing import Iterable, List, AnyStr
+from collections import Counter
+from typing import Iterable, List, AnyStr, Dict, Any, Callable, Optional, Tuple
 
 import card
 import deck
 import load_file
 import mylogger
+import runreport
 import proxy.image_downloader as imd
+import proxy.build_state as bs
+from proxy import output
 import card_downloader as cdl
 
 logger = mylogger.MAINLOGGER
 
+DeckLoaderTy = Callable[[AnyStr, load_file.ReadFuncTy], deck.Deck]
+
+
+def load_deck(fname: AnyStr, readfun: load_file.ReadFuncTy) -> deck.Deck:
+    dck = deck.Deck()
+    dck.guarded_load(fname, readfun)
+    return dck
+
 
 def load_existing_decks(maindeck: deck.Deck,
                         decklist: Iterable[AnyStr],
                         readfun: load_file.ReadFuncTy,
-                        other_decks: List[deck.Deck] = None) -> List[deck.Deck]:
+                        other_decks: List[deck.Deck] = None,
+                        loader: DeckLoaderTy = load_deck) -> List[deck.Deck]:
     if other_decks is None:
         # noinspection PyShadowingNames
         other_decks = []
     for existing_deck_name in decklist:
-        newdeck = deck.Deck()
-        newdeck.guarded_load(existing_deck_name, readfun)
+        newdeck = loader(existing_deck_name, readfun)
         if newdeck != maindeck and newdeck not in other_decks:
             other_decks.append(newdeck)
     return other_decks
 
 
-def build_proxies(settings):
-    if settings.inventory is not None:
-        def inline_load(i):
-            tdeck = deck.Deck()
-            tdeck.guarded_load(i, settings.inventory_readfunc)
-            return tdeck
-
-        all_inv = [inline_load(i) for i in settings.inventory]
-        combined_inv = sum(all_inv)
-    else:
-        combined_inv = deck.Deck()
+def _layout_settings(settings) -> Dict[str, Any]:
+    """
+    Everything besides the proxy list that changes the content of the output.
+    """
+    try:
+        template_time = os.path.getmtime(settings.template)
+    except OSError:
+        template_time = None
+    return {"output": settings.output,
+            "paper": [[p.name, p.width, p.height, list(p.margins)] for p in settings.paper],
+            # a list, as the state comes back from json
+            "card_size": settings.card_size if isinstance(settings.card_size, str) else list(settings.card_size),
+            "cut_thickness": settings.cutthick,
+            "cut_color": settings.cutcol,
+            "background": settings.background,
+            "figures": settings.figures,
+            "template": [settings.template, template_time],
+            "shard_pages": settings.shard_pages}
 
-    dck = deck.Deck()
-    dck.guarded_load(settings.input, settings.readfunc)
-    if settings.alldecks is None:
-        other_decks = []
-    else:
-        other_decks = load_existing_decks(dck, settings.alldecks, settings.alldecks_readfunc)
+
+def find_proxies(settings, loader: DeckLoaderTy = load_deck) -> Tuple[deck.Deck, deck.Deck]:
+    """
+    Load the input deck and return it together with the cards that have to be proxied:
+    those not in the inventory once the other decks took their share.
+    """
+    with runreport.stage("inventory load"):
+        if settings.inventory is not None:
+            all_inv = [loader(i, settings.inventory_readfunc) for i in settings.inventory]
+            combined_inv = sum(all_inv)
+        else:
+            combined_inv = deck.Deck()
+
+    with runreport.stage("deck load"):
+        dck = loader(settings.input, settings.readfunc)
+    with runreport.stage("alldecks load"):
+        if settings.alldecks is None:
+            other_decks = []
+        else:
+            other_decks = load_existing_decks(dck, settings.alldecks, settings.alldecks_readfunc,
+                                              loader=loader)
+    with runreport.stage("exclusion"):
+        dck, proxies = _exclude_owned(settings, dck, combined_inv, other_decks)
+    runreport.count("proxy cards", sum(proxies.full_deck.values()))
+    runreport.count("unique proxy cards", len(proxies.full_deck))
+    logger.info(verbose_msg="PROXY LIST")
+    logger.info(verbose_msg=proxies)
+    return dck, proxies
+
+
+def _exclude_owned(settings, dck: deck.Deck, combined_inv: deck.Deck, other_decks: List[deck.Deck]) \
+        -> Tuple[deck.Deck, deck.Deck]:
     logger.info("Removing existing decks from inventory")
     for i, d in enumerate(other_decks):
         if not settings.specific_edition:
@@ -51,7 +96,6 @@ def build_proxies(settings):
         if not settings.include_basics:
             d = deck.remove_basic_lands(d)
         other_decks[i] = d
-    from collections import Counter
     c = Counter()
     for other_deck in other_decks:
         c += other_deck.full_deck
@@ -67,22 +111,88 @@ def build_proxies(settings):
         proxies = dck
     logger.info("Removing remaining inventory from input deck")
 
-    proxies = deck.exclude_inventory_from_deck(proxies, combined_inv)
+    return dck, deck.exclude_inventory_from_deck(proxies, combined_inv)
 
-    logger.info(verbose_msg="PROXY LIST")
-    logger.info(verbose_msg=str(proxies))
-    session = cdl.CardDownloader()
-    image_fnames = imd.get_all_images(proxies, settings.figures, session)
+
+def load_state(settings, proxies: deck.Deck) -> Optional[bs.BuildState]:
+    if not settings.incremental:
+        return None
+    state = bs.load_build_state(bs.state_filename(settings.output))
+    layout_settings = _layout_settings(settings)
+    if state is not None and state.settings != layout_settings:
+        logger.info("Output settings changed, rebuilding all pages")
+        state = bs.BuildState(images=state.images)
+    if state is not None:
+        added, removed = state.delta(proxies.full_deck)
+        logger.info("Proxy list changed: {0} added, {1} removed".format(sum(added.values()),
+                                                                         sum(removed.values())))
+    return state
+
+
+def render_proxies(settings, dck: deck.Deck, proxies: deck.Deck, image_fnames: Dict[card.Card, str],
+                   state: Optional[bs.BuildState] = None):
     rel_fig_dir = os.path.relpath(settings.figures, os.path.dirname(settings.output))
     if rel_fig_dir == ".":
         rel_fig_dir = ""
-    proxies.output_latex_proxies(settings.output, image_fnames, rel_fig_dir, settings.template,
-                                 mypaper=settings.paper,
-                                 cut_color=settings.cutcol,
-                                 cut_thickness=settings.cutthick,
-                                 card_dimensions=None,
-                                 background_colour=settings.background
-                                 )
+    image_fnames = {c: f for c, f in image_fnames.items() if c in proxies.full_deck}
+    previous_cells = state.cells if state is not None else None
+    if os.path.splitext(settings.output)[1].lower() == ".pdf":
+        writer = output.OutputPDF(rel_fig_dir)
+        writer.load_image_list({image_fnames[c]: n for c, n in proxies.full_deck.items() if c in image_fnames},
+                               previous_cells)
+        if state is not None and writer.cell_paths() == previous_cells and os.path.isfile(settings.output):
+            logger.info("Proxy sheets unchanged, nothing to write")
+        else:
+            writer = proxies.output_pdf_proxies(settings.output, image_fnames, rel_fig_dir,
+                                                previous_cells=previous_cells,
+                                                mypaper=settings.paper,
+                                                cut_color=settings.cutcol,
+                                                cut_thickness=settings.cutthick,
+                                                card_dimensions=settings.card_size,
+                                                background_color=settings.background or "black"
+                                                )
+    else:
+        writer = proxies.output_latex_proxies(settings.output, image_fnames, rel_fig_dir, settings.template,
+                                              shard_pages=settings.shard_pages,
+                                              previous_cells=previous_cells,
+                                              previous_shards=state.shards if state is not None else None,
+                                              mypaper=settings.paper,
+                                              cut_color=settings.cutcol,
+                                              cut_thickness=settings.cutthick,
+                                              card_dimensions=settings.card_size,
+                                              background_colour=settings.background
+                                              )
+    if settings.incremental:
+        bs.save_build_state(bs.state_filename(settings.output),
+                            bs.BuildState(_layout_settings(settings), proxies.full_deck, image_fnames,
+                                          writer.cell_paths(), writer.shard_signatures))
     tdeck = deck.exclude_inventory_from_deck(dck, proxies)
     logger.info("--- Already owned cards ---")
     logger.info(tdeck)
+
+
+def start_report() -> Dict[str, float]:
+    runreport.REPORT.reset()
+    return cdl.get_shared_downloader().metrics.snapshot()
+
+
+def finish_report(settings, start_counters: Dict[str, float]):
+    for name, n in cdl.get_shared_downloader().metrics.snapshot().items():
+        if n != start_counters.get(name, 0):
+            runreport.count(name, n - start_counters.get(name, 0))
+    logger.info("--- Timings ---")
+    logger.info(runreport.REPORT.summary())
+    if settings.report is not None:
+        runreport.REPORT.save(settings.report)
+
+
+def build_proxies(settings):
+    start_counters = start_report()
+    dck, proxies = find_proxies(settings)
+    state = load_state(settings, proxies)
+    session = cdl.get_shared_downloader()
+    image_fnames = imd.get_all_images(proxies, settings.figures, session,
+                                      known=state.images if state is not None else None)
+    with runreport.stage("render"):
+        render_proxies(settings, dck, proxies, image_fnames, state)
+    finish_report(settings, start_counters)
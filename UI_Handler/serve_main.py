@@ -0,0 +1,216 @@
+import errno
+import hmac
+import io
+import json
+import logging
+import os
+import secrets
+import socket
+import socketserver
+import stat
+import sys
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional
+
+import mylogger
+
+logger = mylogger.MAINLOGGER
+
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), "mtg-proxybuilder.sock")
+
+
+class _CollectingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.INFO)
+        self.records = []  # type: List[List[Any]]
+
+    def emit(self, record: logging.LogRecord):
+        self.records.append([record.levelno, self.format(record)])
+
+
+class JobServerMixin:
+    """
+    Runs the jobs received by the server one at a time: the working directory and the
+    verbose flag are process wide, everything else (sessions, caches, templates) stays warm
+    between jobs.
+    """
+    daemon_threads = True
+
+    # secret every request must carry, None accepts any request
+    token = None  # type: Optional[str]
+
+    def setup_jobs(self, make_parser, run_command):
+        self.make_parser = make_parser
+        self.run_command = run_command
+        self.job_lock = threading.Lock()
+        self.verbose = logger.verbose
+
+    def run_job(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        if self.token is not None and not hmac.compare_digest(str(request.get("token", "")), self.token):
+            return {"status": 1, "error": "Bad request: wrong or missing token", "log": []}
+        collector = _CollectingHandler()
+        report = io.StringIO()
+        status, error = 0, None
+        with self.job_lock:
+            cwd = os.getcwd()
+            logger.addHandler(collector)
+            try:
+                os.chdir(request.get("cwd", cwd))
+                args = self.make_parser().parse_args(request["argv"])
+                if args.cmd in (serve, client):
+                    raise ValueError("serve and client can not be run as a job")
+                if "-" in (getattr(args, "input", None), getattr(args, "output", None)):
+                    # the server's stdin and stdout are not the client's
+                    raise ValueError("jobs can not read stdin or write stdout ('-'), use files")
+                self.run_command(args, out=report, job=True)
+            except SystemExit as e:
+                status = e.code if isinstance(e.code, int) else 1
+            except Exception as e:
+                status, error = 1, "{0}: {1}".format(type(e).__name__, e)
+                logger.error("Job {0} failed".format(request.get("argv")), verbose_msg=error)
+            finally:
+                logger.removeHandler(collector)
+                logger.verbose = self.verbose
+                os.chdir(cwd)
+        if report.getvalue():
+            # profiles, printed to stderr when run from the command line
+            collector.records.append([logging.WARNING, report.getvalue().rstrip("\n")])
+        return {"status": status, "error": error, "log": collector.records}
+
+
+class JobHandler(socketserver.StreamRequestHandler):
+    """
+    One json request per line, answered by one json line.
+    """
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                response = self.server.run_job(json.loads(line.decode("utf-8")))
+            except (ValueError, KeyError) as e:
+                response = {"status": 1, "error": "Bad request: {0}".format(e), "log": []}
+            self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+if hasattr(socket, "AF_UNIX"):
+    class UnixJobServer(JobServerMixin, socketserver.ThreadingUnixStreamServer):
+        pass
+
+
+class TCPJobServer(JobServerMixin, socketserver.ThreadingTCPServer):
+    """
+    Any local user can connect to the port, so the server writes a random token to a file only
+    its user can read, `token_path(port)`, and runs the jobs of the clients sending it.
+    """
+    allow_reuse_address = True
+    token_file = None  # type: Optional[str]
+
+    def setup_jobs(self, make_parser, run_command):
+        super().setup_jobs(make_parser, run_command)
+        self.token = secrets.token_hex(16)
+        self.token_file = token_path(self.server_address[1])
+        try:
+            os.remove(self.token_file)
+        except FileNotFoundError:
+            pass
+        # created only readable by the owner, failing if another user made the file in between
+        fd = os.open(self.token_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with open(fd, "w") as f:
+            f.write(self.token)
+
+    def server_close(self):
+        super().server_close()
+        if self.token_file is not None:
+            try:
+                os.remove(self.token_file)
+            except FileNotFoundError:
+                pass
+
+
+def token_path(port: int) -> str:
+    return os.path.join(os.path.dirname(DEFAULT_SOCKET), "mtg-proxybuilder-{0}.token".format(port))
+
+
+def make_server(make_parser, run_command, socket_path: str = None, port: int = None) \
+        -> socketserver.BaseServer:
+    if port is not None:
+        server = TCPJobServer(("127.0.0.1", port), JobHandler)
+    else:
+        _check_unix_sockets()
+        _remove_stale_socket(socket_path)
+        server = UnixJobServer(socket_path, JobHandler)
+    try:
+        server.setup_jobs(make_parser, run_command)
+    except BaseException:
+        server.server_close()
+        raise
+    return server
+
+
+def _check_unix_sockets():
+    if not hasattr(socket, "AF_UNIX"):
+        raise ValueError("unix sockets are not available on this system, use --port")
+
+
+def _remove_stale_socket(socket_path: str):
+    """
+    Remove the socket left by a server that is gone, refuse to take over one that still answers.
+    """
+    try:
+        mode = os.stat(socket_path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError(errno.EEXIST, "Not a socket", socket_path)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+        except OSError:
+            os.remove(socket_path)
+            return
+    raise OSError(errno.EADDRINUSE, "A job server is already running", socket_path)
+
+
+def serve(settings):
+    # load the proxy builder up front instead of in the first job
+    from . import proxybuild_main
+    server = make_server(settings.make_parser, settings.run_command, settings.socket, settings.port)
+    logger.info("Serving jobs on {0}".format(settings.socket if settings.port is None
+                                             else "127.0.0.1:{0}".format(settings.port)))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if settings.port is None and os.path.exists(settings.socket):
+            os.remove(settings.socket)
+
+
+def send_job(argv: List[str], socket_path: str = None, port: int = None, cwd: str = None) -> Dict[str, Any]:
+    request = {"argv": argv, "cwd": cwd or os.getcwd()}
+    if port is not None:
+        with open(token_path(port)) as f:
+            request["token"] = f.read().strip()
+        sock = socket.create_connection(("127.0.0.1", port))
+    else:
+        _check_unix_sockets()
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(socket_path)
+    with sock, sock.makefile("rwb") as f:
+        f.write((json.dumps(request) + "\n").encode("utf-8"))
+        f.flush()
+        return json.loads(f.readline().decode("utf-8"))
+
+
+def client(settings):
+    response = send_job(settings.job, settings.socket, settings.port)
+    for level, msg in response["log"]:
+        print(msg, file=sys.stdout if level < logging.WARNING else sys.stderr)
+    if response["error"]:
+        print(response["error"], file=sys.stderr)
+    if response["status"]:
+        sys.exit(response["status"])
@@ -0,0 +1,205 @@
+"""
+Synthetic inventories, decks and alldecks folders for benchmarks and profiling at scale.
+
+    python -m benchmarks.generate OUTDIR [--cards 5000] [--decks 50] [--format txt] [--seed 0]
+
+Editions are real set codes from `card_set_codes`, a few sets and languages being much more
+common than the others. The same seed and options always produce the same files.
+"""
+import argparse
+import csv
+import itertools
+import os
+import random
+import typing
+from typing import Dict, List, Sequence, Tuple
+
+import card
+import deck
+import save_file
+from card_set_codes import get_mtgset_codes
+
+SYLLABLES = ("ar", "bo", "cel", "dra", "en", "fal", "gor", "hel", "is", "jor", "ka", "lum", "mor",
+             "nix", "or", "pyr", "quel", "ra", "sha", "tor", "ul", "vex", "wyr", "zan")
+BASIC_LANDS = ("Plains", "Island", "Swamp", "Mountain", "Forest")
+# (deckbox language name, weight)
+LANGUAGES = (("English", 80), ("German", 6), ("French", 4), ("Italian", 3), ("Spanish", 3),
+             ("Japanese", 2), ("Russian", 2))
+DECK_FORMATS = {"txt": (save_file.save_txt, "txt"),
+                "xmage": (save_file.save_xmage, "dck"),
+                "json": (save_file.save_json, "json")}
+DECKBOX_HEADER = ("Count", "Tradelist Count", "Name", "Edition", "Card Number", "Condition", "Language",
+                  "Foil", "Signed", "Artist Proof", "Altered Art", "Misprint", "Promo", "Textless", "My Price")
+
+# (edition name, set code, collectors number)
+PrintingTy = Tuple[str, str, int]
+
+
+def card_names(n: int, rng: random.Random) -> List[str]:
+    names = set()
+    while len(names) < n:
+        words = ("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+                 for _ in range(rng.randint(1, 3)))
+        names.add(" ".join(words))
+    return sorted(names)
+
+
+def editions() -> List[Tuple[str, str]]:
+    """
+    One (name, code) per set known to `card_set_codes`, leaving out the sets xmage can not load.
+    """
+    by_code = {}  # type: Dict[str, str]
+    for name, code in sorted(get_mtgset_codes().items()):
+        if code not in save_file.WriteHandleXMageLine.unsupported_sets:
+            by_code.setdefault(code, name)
+    return sorted((name, code) for code, name in by_code.items())
+
+
+class SyntheticCollection:
+    """
+    A pool of cards with their printings, from which inventories and decks are drawn.
+
+    :param cards: number of distinct card names
+    :param duplicates: chance of every inventory entry to be followed by one more printing of the same card
+    :param overlap: share of the deck slots taken from the staples, cards played in many decks
+    """
+    def __init__(self, cards: int = 2000, seed: int = 0, duplicates: float = 0.2, overlap: float = 0.3):
+        self.rng = random.Random(seed)
+        self.duplicates = duplicates
+        self.overlap = overlap
+        self.names = card_names(cards, self.rng)
+        self.staples = self.rng.sample(self.names, max(1, cards // 20))
+        self.sets = editions()
+        self.rng.shuffle(self.sets)
+        # the first sets of the shuffled list are the most common ones
+        self.set_weights = [1 / (i + 1) for i in range(len(self.sets))]
+        self.language_names = [l for l, w in LANGUAGES]
+        self.language_weights = [w for l, w in LANGUAGES]
+
+    def printing(self) -> PrintingTy:
+        name, code = self.rng.choices(self.sets, self.set_weights)[0]
+        return name, code, self.rng.randint(1, 350)
+
+    def language(self) -> str:
+        return self.rng.choices(self.language_names, self.language_weights)[0]
+
+    def inventory_rows(self) -> List[Tuple[int, str, PrintingTy, str]]:
+        rows = []
+        for name in itertools.chain(self.names, BASIC_LANDS):
+            rows.append((self.rng.randint(1, 4), name, self.printing(), self.language()))
+            while self.rng.random() < self.duplicates:
+                rows.append((self.rng.randint(1, 4), name, self.printing(), self.language()))
+        return rows
+
+    def _pick(self) -> str:
+        return self.rng.choice(self.staples if self.rng.random() < self.overlap else self.names)
+
+    def _cards(self, size: int) -> Dict[card.Card, int]:
+        cards = {}  # type: Dict[card.Card, int]
+        total = 0
+        while total < size:
+            ed_name, code, number = self.printing()
+            c = card.Card(self._pick().lower(), code, number)
+            n = min(self.rng.randint(1, 4), 4 - cards.get(c, 0), size - total)
+            cards[c] = cards.get(c, 0) + n
+            total += n
+        return cards
+
+    def deck(self, size: int = 60, sideboard: int = 15, name: str = "") -> deck.Deck:
+        lands = size * 2 // 5
+        mainboard = self._cards(size - lands)
+        for land in self.rng.sample(BASIC_LANDS, self.rng.randint(1, 3)):
+            ed_name, code, number = self.printing()
+            mainboard[card.Card(land.lower(), code, number)] = 0
+        basics = [c for c, n in mainboard.items() if n == 0]
+        for i in range(lands):
+            mainboard[basics[i % len(basics)]] += 1
+        return deck.Deck(mainboard, self._cards(sideboard) if sideboard else None, name=name)
+
+
+def write_inventory_rows(outstream: typing.TextIO, rows: Sequence[Tuple[int, str, PrintingTy, str]]):
+    """
+    Write the rows as a deckbox.org inventory export.
+    """
+    writer = csv.writer(outstream)
+    writer.writerow(DECKBOX_HEADER)
+    for count, name, (ed_name, code, number), language in rows:
+        writer.writerow((count, 0, name, ed_name.title(), number, "Near Mint", language,
+                         "", "", "", "", "", "", "", "$0.10"))
+
+
+def write_inventory(fname: str, rows: Sequence[Tuple[int, str, PrintingTy, str]]):
+    with open(fname, "w", newline="") as f:
+        write_inventory_rows(f, rows)
+
+
+def write_deck(fname: str, dck: deck.Deck, fmt: str = "txt"):
+    saver = DECK_FORMATS[fmt][0]
+    with open(fname, "w") as f:
+        saver(f, dck.mainboard.items(), dck.sideboard.items(), dck.name)
+
+
+def generate(directory: str, cards: int = 2000, decks: int = 20, deck_size: int = 60, sideboard: int = 15,
+             fmt: str = "txt", seed: int = 0, duplicates: float = 0.2, overlap: float = 0.3) -> Dict[str, str]:
+    """
+    Write `inventory.csv`, the input deck `deck.<ext>` and `decks - 1` other decks in `alldecks/`.
+    """
+    collection = SyntheticCollection(cards, seed, duplicates, overlap)
+    ext = DECK_FORMATS[fmt][1]
+    alldecks = os.path.join(directory, "alldecks")
+    os.makedirs(alldecks, exist_ok=True)
+    paths = {"inventory": os.path.join(directory, "inventory.csv"),
+             "deck": os.path.join(directory, "deck." + ext),
+             "alldecks": alldecks}
+    write_inventory(paths["inventory"], collection.inventory_rows())
+    write_deck(paths["deck"], collection.deck(deck_size, sideboard, "deck"), fmt)
+    for i in range(1, decks):
+        name = "deck_{0:04d}".format(i)
+        write_deck(os.path.join(alldecks, name + "." + ext), collection.deck(deck_size, sideboard, name), fmt)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic decks and inventories")
+    parser.add_argument("directory",
+                        help="output folder")
+    parser.add_argument("--cards",
+                        type=int,
+                        default=2000,
+                        help="number of distinct cards in the collection")
+    parser.add_argument("--decks",
+                        type=int,
+                        default=20,
+                        help="number of decks, the input deck included")
+    parser.add_argument("--deck-size",
+                        type=int,
+                        default=60,
+                        help="mainboard size")
+    parser.add_argument("--sideboard",
+                        type=int,
+                        default=15,
+                        help="sideboard size")
+    parser.add_argument("--format",
+                        choices=sorted(DECK_FORMATS),
+                        default="txt",
+                        help="deck format")
+    parser.add_argument("--duplicates",
+                        type=float,
+                        default=0.2,
+                        help="chance of an inventory entry to have one more printing")
+    parser.add_argument("--overlap",
+                        type=float,
+                        default=0.3,
+                        help="share of deck slots taken from cards common to many decks")
+    parser.add_argument("--seed",
+                        type=int,
+                        default=0)
+    args = parser.parse_args(argv)
+    paths = generate(args.directory, args.cards, args.decks, args.deck_size, args.sideboard, args.format,
+                     args.seed, args.duplicates, args.overlap)
+    for k, v in sorted(paths.items()):
+        print("{0}: {1}".format(k, v))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Card and query pages laid out like the magiccards.info pages `HTMLAnalyzer` reads.
+"""
+from typing import Sequence, Tuple
+
+# (code, name, collectors number) of the printings listed on a page
+EditionTy = Tuple[str, str, int]
+
+NAV_TABLE = """<table id="nav" border="0" cellpadding="0" cellspacing="0" width="100%">
+<tr><td><a href="/"><img src="/images/logo.png" alt="magiccards.info"></a></td>
+<td><form action="/query"><input type="text" name="q"></form></td>
+<td><a href="/sitemap.html">Sitemap</a> <a href="/search.html">Advanced</a></td></tr>
+</table>
+"""
+
+FOOTER = """<p><small>The information presented on this site about Magic: The Gathering, both literal
+and graphical, is copyrighted by Wizards of the Coast. This website is not produced, endorsed,
+supported, or affiliated with Wizards of the Coast.</small></p>
+"""
+
+
+def card_table(name: str, type_line: str, mana: str, editions: Sequence[EditionTy],
+               language: str = "en", text: str = "") -> str:
+    code, edition_name, number = editions[0]
+    links = "\n".join('<img src="/images/en.gif" alt="{1}"> <a href="/{0}/{3}/{2}.html">{1}</a><br>'
+                      .format(c, n, num, language) for c, n, num in editions)
+    return """<table border="0" cellpadding="0" cellspacing="0" width="100%" align="center">
+<tr>
+<td width="312" valign="top">
+<img src="http://magiccards.info/scans/{language}/{code}/{number}.jpg" alt="{name}" width="312" height="445">
+</td>
+<td valign="top" style="padding: 0.5em;" width="70%">
+<span style="font-size: 1.5em;"><a href="/{code}/{language}/{number}.html">{name}</a>
+<img src="/images/en.gif" alt="English" width="16" height="11"></span>
+<p>{type_line},
+  {mana}</p>
+<p class="ctext"><b>{text}</b></p>
+<p><i>Illus. Anonymous</i></p>
+</td>
+<td width="180" valign="top" align="right" style="font-size: 0.9em;">
+<small><b>Card text:</b>
+<u><b>Editions:</b></u><br>
+{links}
+<br><u><b>Languages:</b></u><br>
+<img src="/images/de.gif" alt="German"> <a href="/{code}/de/{number}.html">Deutsch</a><br>
+</small>
+</td>
+</tr>
+</table>
+""".format(name=name, type_line=type_line, mana=mana, code=code, number=number, language=language,
+           text=text or "{0} does something.".format(name), links=links)
+
+
+def page(tables: Sequence[str], title: str = "magiccards.info") -> str:
+    return ("<!DOCTYPE html>\n<html><head><title>{0}</title>"
+            "<link rel=\"stylesheet\" href=\"/css/magiccards.css\"></head>\n<body>\n{1}{2}{3}</body></html>\n"
+            .format(title, NAV_TABLE, "".join(tables), FOOTER))
+
+
+def card_page(name: str, type_line: str = "Instant", mana: str = "R (1)",
+              editions: Sequence[EditionTy] = (("m10", "Magic 2010", 146),), language: str = "en") -> str:
+    return page([card_table(name, type_line, mana, editions, language)], title=name)
+
+
+def query_page(cards: Sequence[Tuple[str, str, str, Sequence[EditionTy]]]) -> str:
+    """
+    Result page of a query matching several cards, one table per card.
+    """
+    return page([card_table(*c) + "<hr>\n" for c in cards], title="Search results")
@@ -0,0 +1,318 @@
+"""
+Throughput of the deck parsers, deck algebra, page parsing, image downloads from a local
+stand-in of magiccards.info and latex rendering.
+
+    python -m benchmarks.run [-o results.json] [--sizes 100,1000] [-k read_]
+    python -m benchmarks.run --compare before.json after.json
+
+Run from the repository root. Every benchmark is timed at several input sizes,
+the results (best time of several repeats) are written as json so two commits can be compared.
+"""
+import argparse
+import atexit
+import contextlib
+import functools
+import io
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+import card
+import deck
+import load_file
+import mana_types
+import mylogger
+import save_file
+import card_downloader
+from proxy import output
+from benchmarks import generate, pages, standin
+from proxy import image_downloader
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SIZES = (100, 1000, 10000)
+
+# setup(size) returns the function to time and the number of items it processes
+SetupTy = Callable[[int], Tuple[Callable[[], Any], int]]
+
+
+class Benchmark:
+    def __init__(self, name: str, setup: SetupTy, max_size: int = None):
+        self.name = name
+        self.setup = setup
+        self.max_size = max_size
+
+    def sizes(self, sizes: Sequence[int]) -> List[int]:
+        return [s for s in sizes if self.max_size is None or s <= self.max_size]
+
+
+BENCHMARKS = []  # type: List[Benchmark]
+
+
+def benchmark(name: str, max_size: int = None):
+    def register(setup: SetupTy) -> SetupTy:
+        BENCHMARKS.append(Benchmark(name, setup, max_size))
+        return setup
+    return register
+
+
+EDITIONS = ("m10", "m11", "lea", "leb", "2ed", "ice", "mir", "tmp", "usg", "mmq")
+
+
+def card_names(n: int, seed: int = 0) -> List[str]:
+    return generate.card_names(n, random.Random(seed))
+
+
+def make_deck(n: int, seed: int = 0, editions: bool = True) -> deck.Deck:
+    rng = random.Random(seed)
+    cards = {card.Card(name.lower(), rng.choice(EDITIONS) if editions else ""): rng.randint(1, 4)
+             for name in card_names(n, seed)}
+    return deck.Deck(cards)
+
+
+def _deck_text(dck: deck.Deck, saver) -> str:
+    out = io.StringIO()
+    dck.save(out, saver)
+    return out.getvalue()
+
+
+def _reader(readfunc, text: str, items: int):
+    return lambda: readfunc(io.StringIO(text)), items
+
+
+@benchmark("read_txt")
+def _read_txt(size):
+    return _reader(load_file.read_txt, _deck_text(make_deck(size), save_file.save_txt), size)
+
+
+@benchmark("read_csv")
+def _read_csv(size):
+    rows = generate.SyntheticCollection(size, seed=size, duplicates=0).inventory_rows()
+    out = io.StringIO()
+    generate.write_inventory_rows(out, rows)
+    return _reader(load_file.read_inventory_deckbox_org, out.getvalue(), len(rows))
+
+
+@benchmark("read_xmage_deck")
+def _read_xmage(size):
+    rng = random.Random(size)
+    text = "NAME:benchmark\n" + "".join(
+        "{0} [{1}:{2}] {3}\n".format(rng.randint(1, 4), rng.choice(EDITIONS).upper(), rng.randint(1, 300), name)
+        for name in card_names(size))
+    return _reader(load_file.read_xmage_deck, text, size)
+
+
+@benchmark("read_json")
+def _read_json(size):
+    return _reader(load_file.read_json, _deck_text(make_deck(size), save_file.save_json), size)
+
+
+@benchmark("deck_add")
+def _deck_add(size):
+    a, b = make_deck(size, 1), make_deck(size, 2)
+    return lambda: a + b, 2 * size
+
+
+@benchmark("deck_remove_version")
+def _deck_remove_version(size):
+    dck = make_deck(size)
+    return lambda: deck.Deck(*dck.remove_version()), size
+
+
+@benchmark("exclude_inventory_from_deck", max_size=1000)
+def _exclude(size):
+    dck, inventory = make_deck(size, 1, editions=False), make_deck(size, 2)
+    inventory += deck.Deck({c: 2 for c in list(dck.full_deck)[::2]})
+    return lambda: deck.exclude_inventory_from_deck(dck, inventory), size
+
+
+@benchmark("analyse_mana_string")
+def _mana(size):
+    rng = random.Random(size)
+    strings = [rng.choice(("", "1", "2", "X")) + "".join(rng.choice("WUBRG") for _ in range(rng.randint(0, 3)))
+               + rng.choice(("", "{U/W}", "{2/R}", "{GP}")) or "0" for _ in range(size)]
+
+    def run():
+        for s in strings:
+            mana_types.analyse_mana_string(s)
+    return run, size
+
+
+def _html_benchmark(size: int, parser: str = None):
+    rng = random.Random(size)
+    htmls = []
+    for name in card_names(min(size, 50)):
+        editions = [(e, e.upper(), rng.randint(1, 300)) for e in rng.sample(EDITIONS, rng.randint(1, 6))]
+        htmls.append((name, pages.card_page(name, "Creature - Elf 1/1", "1G (2)", editions)))
+    analyzer_type = type("HTMLAnalyzer", (card_downloader.HTMLAnalyzer,), {"parser": parser})
+
+    def run():
+        for i in range(size):
+            name, html = htmls[i % len(htmls)]
+            analyzer = analyzer_type(html, name)
+            analyzer.analyse_main_rules()
+            list(analyzer.get_all_editions())
+    return run, size
+
+
+@benchmark("html_analyzer", max_size=100)
+def _html(size):
+    return _html_benchmark(size)
+
+
+@benchmark("html_analyzer_html5lib", max_size=100)
+def _html_html5lib(size):
+    return _html_benchmark(size, "html5lib")
+
+
+@benchmark("output_latex")
+def _latex(size):
+    writer = output.OutputLatex("images")
+    writer.load_image_list({"{0}.jpg".format(name): 1 for name in card_names(size)})
+
+    def run():
+        for _ in writer._generate_latex("template.tex"):
+            pass
+    return run, size
+
+
+@functools.lru_cache(maxsize=None)
+def _standin_server(cards: int) -> standin.StandInServer:
+    """
+    Stand-in site serving a synthetic corpus of `cards` cards, for the life of the process.
+    """
+    corpus = tempfile.mkdtemp(prefix="proxybuilder-corpus-")
+    atexit.register(shutil.rmtree, corpus, True)
+    standin.write_corpus(corpus, card_names(cards))
+    return standin.start_server(corpus)
+
+
+@benchmark("get_all_images", max_size=100)
+def _get_all_images(size):
+    server = _standin_server(size)
+    dck = deck.Deck({card.Card(name.lower()): 1 for name in card_names(size)})
+
+    def run():
+        output_directory = tempfile.mkdtemp(prefix="proxybuilder-images-")
+        try:
+            image_downloader.get_all_images(dck, output_directory, card_downloader.CardDownloader(server.url))
+        finally:
+            shutil.rmtree(output_directory)
+    return run, size
+
+
+def _resolve_benchmark(size: int, parse_processes: int):
+    session = card_downloader.CardDownloader(_standin_server(size).url, parse_processes)
+    atexit.register(session.close)
+    cards = [card.Card(name.lower()) for name in card_names(size)]
+
+    def run():
+        card_downloader.CardDownloader._cached_load_magic_card.cache_clear()
+        save_file.resolve_xmage_cards(cards, session)
+    return run, size
+
+
+@benchmark("resolve_xmage_cards", max_size=100)
+def _resolve(size):
+    return _resolve_benchmark(size, 0)
+
+
+@benchmark("resolve_xmage_cards_processes", max_size=100)
+def _resolve_processes(size):
+    return _resolve_benchmark(size, os.cpu_count() or 1)
+
+
+def measure(func: Callable[[], Any], repeat: int) -> float:
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def run_benchmarks(sizes: Sequence[int], pattern: str = "", repeat: int = 3) -> Dict[str, Any]:
+    results = OrderedDict()  # type: Dict[str, Dict[str, Dict[str, float]]]
+    level = mylogger.MAINLOGGER.level
+    mylogger.MAINLOGGER.setLevel(logging.WARNING)
+    try:
+        for bench in BENCHMARKS:
+            if pattern not in bench.name:
+                continue
+            results[bench.name] = OrderedDict()
+            for size in bench.sizes(sizes):
+                func, items = bench.setup(size)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    seconds = measure(func, repeat)
+                results[bench.name][str(size)] = {"seconds": seconds, "items_per_second": items / seconds}
+                print("{0:<28} {1:>7} {2:>12.6f} s {3:>14.0f} items/s".format(
+                    bench.name, size, seconds, items / seconds), file=sys.stderr)
+    finally:
+        mylogger.MAINLOGGER.setLevel(level)
+    return {"commit": _git_commit(),
+            "time": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": results}
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, universal_newlines=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def compare(before: Dict[str, Any], after: Dict[str, Any]) -> str:
+    lines = ["{0:<28} {1:>7} {2:>12} {3:>12} {4:>8}".format("benchmark", "size", "before (s)", "after (s)",
+                                                            "speedup")]
+    for name, sizes in after["results"].items():
+        for size, result in sizes.items():
+            try:
+                old = before["results"][name][size]["seconds"]
+            except KeyError:
+                continue
+            lines.append("{0:<28} {1:>7} {2:>12.6f} {3:>12.6f} {4:>7.2f}x".format(
+                name, size, old, result["seconds"], old / result["seconds"]))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the benchmarks")
+    parser.add_argument("-o", "--output",
+                        help="json file receiving the results")
+    parser.add_argument("--sizes",
+                        default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma separated input sizes")
+    parser.add_argument("-k",
+                        default="",
+                        help="only run the benchmarks whose name contains this")
+    parser.add_argument("--repeat",
+                        type=int,
+                        default=3,
+                        help="timing repeats, the best one is kept")
+    parser.add_argument("--compare",
+                        nargs=2,
+                        metavar=("BEFORE", "AFTER"),
+                        help="compare two result files instead of running")
+    args = parser.parse_args(argv)
+    if args.compare:
+        with open(args.compare[0]) as f, open(args.compare[1]) as g:
+            print(compare(json.load(f), json.load(g)))
+        return
+    os.chdir(ROOT)
+    results = run_benchmarks([int(s) for s in args.sizes.split(",")], args.k, args.repeat)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+Local stand-in for magiccards.info, replaying a recorded corpus of pages and scans.
+
+    python -m benchmarks.standin CORPUS [--port 8000] [--latency 0.05] [--error-rate 0.01] [--not-found-rate 0.01]
+    python -m benchmarks.standin CORPUS --synthetic 500      # write a synthetic corpus first
+    python -m benchmarks.standin CORPUS --upstream http://magiccards.info  # record what is missing
+
+then point the downloader at it, e.g. `python -m UI_Handler.main --source http://localhost:8000 proxy ...`
+
+A corpus is a folder laid out like the site: card pages in `<edition>/<language>/<number>.html`,
+scans in `scans/<language>/<edition>/<number>.jpg` and query result pages in `query/<query>.html`.
+Queries without a recorded page are answered from `names.json`, which maps lowercase card names to
+the card page of each edition, as the site redirects single matches to the card page.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import socketserver
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Dict, Optional, Sequence, Tuple
+
+import mylogger
+from benchmarks import generate, pages
+
+logger = mylogger.MAINLOGGER
+
+NAMES_FILE = "names.json"
+NO_MATCH_PAGE = pages.page(["<p>Your query did not match any cards.</p>\n"], title="Search results")
+# start of a jpeg file, the scans of a synthetic corpus are only read back as bytes
+FAKE_SCAN = b"\xff\xd8\xff\xe0\x00\x10JFIF\x00" + bytes(range(256)) * 32
+CONTENT_TYPES = {".html": "text/html; charset=utf-8", ".jpg": "image/jpeg", ".png": "image/png"}
+
+
+def query_fname(query: str) -> str:
+    return urllib.parse.quote(" ".join(query.lower().split()), safe="") + ".html"
+
+
+def is_query(urlpath: str) -> bool:
+    return urlpath.rstrip("/") == "/query"
+
+
+def split_query(query: str) -> Tuple[str, Optional[str]]:
+    """
+    Card name and edition code of a query made by `CardDownloader._get_lookup_url`.
+    """
+    m = re.match(r'^(.*?)\s*(?:e:"([^"]*)"(?:/\w+)?)?\s*$', query)
+    return m.group(1).lower().replace("/", "//"), m.group(2) and m.group(2).lower()
+
+
+class Corpus:
+    def __init__(self, directory: str):
+        self.directory = os.path.abspath(directory)
+        self.lock = threading.Lock()
+        self.names = {}  # type: Dict[str, Dict[str, str]]
+        self.reload_names()
+
+    def reload_names(self):
+        try:
+            with open(os.path.join(self.directory, NAMES_FILE)) as f:
+                self.names = json.load(f)
+        except FileNotFoundError:
+            self.names = {}
+
+    def path(self, relpath: str) -> Optional[str]:
+        path = os.path.normpath(os.path.join(self.directory, relpath.lstrip("/")))
+        if os.path.commonpath((path, self.directory)) != self.directory:
+            return None
+        return path if os.path.isfile(path) else None
+
+    def lookup(self, urlpath: str, query: Dict[str, str]) -> Optional[str]:
+        """
+        File answering the request, None if it is not in the corpus.
+        """
+        if is_query(urlpath):
+            q = query.get("q", "")
+            path = self.path(os.path.join("query", query_fname(q)))
+            if path is not None:
+                return path
+            name, edition = split_query(q)
+            editions = self.names.get(name, {})
+            relpath = editions.get(edition) if edition else next(iter(editions.values()), None)
+            return self.path(relpath) if relpath else None
+        return self.path(urllib.parse.unquote(urlpath))
+
+    def record(self, urlpath: str, query: Dict[str, str], content: bytes):
+        if is_query(urlpath):
+            relpath = os.path.join("query", query_fname(query.get("q", "")))
+        else:
+            relpath = urllib.parse.unquote(urlpath).lstrip("/")
+        path = os.path.join(self.directory, relpath)
+        with self.lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(content)
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        logger.debug("Stand-in: " + format, msg_args=args)
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        fault = self.server.draw_fault()
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if fault is not None:
+            self.send_error(fault)
+            return
+        path = self.server.corpus.lookup(url.path, query)
+        if path is not None:
+            with open(path, "rb") as f:
+                content = f.read()
+            self.send_content(content, CONTENT_TYPES.get(os.path.splitext(path)[1], "application/octet-stream"))
+        elif self.server.upstream:
+            self.proxy_upstream(url, query)
+        elif is_query(url.path):
+            # the site answers unknown cards with an empty result page
+            self.send_content(NO_MATCH_PAGE.encode("utf-8"), CONTENT_TYPES[".html"])
+        else:
+            self.send_error(404)
+
+    def proxy_upstream(self, url: urllib.parse.SplitResult, query: Dict[str, str]):
+        import requests
+        res = requests.get(self.server.upstream + url.path, params=query)
+        if res.status_code != 200:
+            self.send_error(res.status_code)
+            return
+        self.server.corpus.record(url.path, query, res.content)
+        self.send_content(res.content, res.headers.get("Content-Type", "application/octet-stream"))
+
+    def send_content(self, content: bytes, content_type: str):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class StandInServer(socketserver.ThreadingMixIn, HTTPServer):
+    """
+    Serves a corpus, adding `latency` seconds to every request; a share `error_rate` of the
+    requests fails with a 503 and a share `not_found_rate` with a 404.
+    """
+    daemon_threads = True
+
+    def __init__(self, corpus: str, port: int = 0, latency: float = 0., error_rate: float = 0.,
+                 not_found_rate: float = 0., seed: int = 0, upstream: str = None):
+        super().__init__(("127.0.0.1", port), StandInHandler)
+        self.corpus = Corpus(corpus)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.not_found_rate = not_found_rate
+        self.upstream = upstream
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return "http://{0}:{1}".format(*self.server_address)
+
+    def draw_fault(self) -> Optional[int]:
+        if not (self.error_rate or self.not_found_rate):
+            return None
+        with self.rng_lock:
+            r = self.rng.random()
+        if r < self.error_rate:
+            return 503
+        if r < self.error_rate + self.not_found_rate:
+            return 404
+        return None
+
+
+def start_server(corpus: str, **kwargs) -> StandInServer:
+    """
+    Start a server on a free port in a daemon thread; stop it with `shutdown()`.
+    """
+    server = StandInServer(corpus, **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def write_corpus(directory: str, names: Sequence[str], seed: int = 0, max_editions: int = 4) \
+        -> Dict[str, Dict[str, str]]:
+    """
+    Write a card page and a scan for every edition of every card, with `pages`' layout.
+    Returns the name index also saved as `names.json`.
+    """
+    rng = random.Random(seed)
+    sets = generate.editions()
+    index = {}  # type: Dict[str, Dict[str, str]]
+    for name in names:
+        printings = [(code.lower(), ed_name.title(), rng.randint(1, 350))
+                     for ed_name, code in rng.sample(sets, rng.randint(1, max_editions))]
+        type_line = rng.choice(("Instant", "Sorcery", "Creature - Elf Warrior {0}/{1}".format(
+            rng.randint(0, 5), rng.randint(1, 5)), "Legendary Artifact"))
+        mana = "{0}{1} ({2})".format(rng.randint(1, 4), rng.choice("WUBRG"), rng.randint(2, 5))
+        index[name.lower()] = {}
+        for i, (code, ed_name, number) in enumerate(printings):
+            # every page lists its own printing first
+            editions = [printings[i]] + printings[:i] + printings[i + 1:]
+            relpath = "{0}/en/{1}.html".format(code, number)
+            _write(directory, relpath, pages.card_page(name, type_line, mana, editions).encode("utf-8"))
+            _write(directory, "scans/en/{0}/{1}.jpg".format(code, number), FAKE_SCAN)
+            index[name.lower()][code] = relpath
+    with open(os.path.join(directory, NAMES_FILE), "w") as f:
+        json.dump(index, f, indent=1, sort_keys=True)
+    return index
+
+
+def _write(directory: str, relpath: str, content: bytes):
+    path = os.path.join(directory, relpath)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a recorded copy of magiccards.info")
+    parser.add_argument("corpus",
+                        help="corpus folder")
+    parser.add_argument("--port",
+                        type=int,
+                        default=8000)
+    parser.add_argument("--latency",
+                        type=float,
+                        default=0.,
+                        help="seconds added to every request")
+    parser.add_argument("--error-rate",
+                        type=float,
+                        default=0.,
+                        help="share of requests answered with a 503")
+    parser.add_argument("--not-found-rate",
+                        type=float,
+                        default=0.,
+                        help="share of requests answered with a 404")
+    parser.add_argument("--seed",
+                        type=int,
+                        default=0)
+    parser.add_argument("--synthetic",
+                        type=int,
+                        metavar="CARDS",
+                        help="write a synthetic corpus of this many cards first")
+    parser.add_argument("--upstream",
+                        help="site fetched and recorded when a page is not in the corpus")
+    args = parser.parse_args(argv)
+    if args.synthetic:
+        write_corpus(args.corpus, generate.card_names(args.synthetic, random.Random(args.seed)), args.seed)
+    server = StandInServer(args.corpus, args.port, args.latency, args.error_rate, args.not_found_rate,
+                           args.seed, args.upstream)
+    print("Serving {0} on {1}".format(args.corpus, server.url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
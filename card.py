@@ -7,6 +7,9 @@ from export.jsonencoders import JSONable
 
 
 class Card(JSONable):
+    json_fields = ("name", "edition", "collectors_number", "language",
+                   "_supertypes", "_types", "_subtypes", "mana", "pt")
+
     def to_json(self) -> Dict[str, str]:
         d = super().to_json()
         d.update({"name": self.name,
@@ -120,7 +123,7 @@ class Card(JSONable):
                     self.collectors_number,
                     self.language)
 
-    def load_extended_information(self, analyzed_html: card_dl.HTMLAnalyzer):
+    def load_extended_information(self, analyzed_html: card_dl.CardInfoTy):
         mana, pt, alltypes = analyzed_html.analyse_main_rules()
         self.mana = mana
         self._pt = pt
@@ -163,9 +166,9 @@ class Card(JSONable):
 
 def force_edition_and_number_copy(card: Card, session: card_dl.CardDownloader = None) -> Card:
     if session is None:
-        session = card_dl.CardDownloader()
-    analyzer = session.make_html_analyzer(card.name, card.edition, next(card.magiccards_info_number_list()),
-                                          card.language)
+        session = card_dl.get_shared_downloader()
+    analyzer = session.load_card_record(card.name, card.edition, next(card.magiccards_info_number_list(), None),
+                                        card.language)
     edition = card.edition
     num = card.collectors_number
     language = card.language
@@ -177,7 +180,7 @@ def force_edition_and_number_copy(card: Card, session: card_dl.CardDownloader =
     return Card(analyzer.get_main_name(), edition, num, language, parts)
 
 
-def make_fully_qualified_card_from_info(analyzer: card_dl.HTMLAnalyzer) -> Card:
+def make_fully_qualified_card_from_info(analyzer: card_dl.CardInfoTy) -> Card:
     url = analyzer.get_main_edition_link()
     edition, language, collectors_number, is_double = card_dl.analyse_hyperref(url)
     name = analyzer.get_main_name()
@@ -191,10 +194,10 @@ def make_fully_qualified_card(name: AnyStr = None, edition: AnyStr = None,
     if name is None and (edition is None or collectors_number is None):
         raise ValueError("bad inputs")
     if session is None:
-        session = card_dl.CardDownloader()
+        session = card_dl.get_shared_downloader()
     if language is None and name is None:
         language = "en"
     if edition is not None:
         edition = get_mtgset_codes().get(edition, edition)
-    analyzer = session.make_html_analyzer(name, edition, collectors_number, language)
+    analyzer = session.load_card_record(name, edition, collectors_number, language)
     return make_fully_qualified_card_from_info(analyzer)
@@ -1,18 +1,28 @@
 import os
-import requests
 import difflib
 import re
 import functools
-from typing import List, Tuple, Iterable, Generator, Dict, Optional
+import threading
+import typing
+from typing import Callable, List, Tuple, Iterable, Generator, Dict, Optional, TypeVar, Union
 from card_set_codes import get_mtgset_codes
 
-from bs4 import BeautifulSoup, Tag
+# requests and bs4 are imported where they are used, they dominate the start up time
+if typing.TYPE_CHECKING:
+    import requests
+    from bs4 import BeautifulSoup, Tag
+    from concurrent.futures import ProcessPoolExecutor
 
+import metrics
 import mylogger
 import mana_types
 
 logger = mylogger.MAINLOGGER
 
+DEFAULT_SOURCE = "http://magiccards.info"
+# worker processes parsing the card pages, 0 parses them in the thread that downloaded them
+DEFAULT_PARSE_PROCESSES = 0
+
 
 def fix_magiccards_info_code(shortcode: str) -> str:
     codes = {
@@ -21,14 +31,35 @@ def fix_magiccards_info_code(shortcode: str) -> str:
     return codes.get(shortcode, shortcode)
 
 
+@functools.lru_cache(maxsize=None)
+def default_html_parser() -> str:
+    """
+    Fastest tree builder available: lxml when it is installed, the standard library parser otherwise.
+    """
+    try:
+        import lxml
+        return "lxml"
+    except ImportError:
+        return "html.parser"
+
+
 class HTMLAnalyzer:
-    @staticmethod
-    def _make_soup(html: str) -> BeautifulSoup:
-        return BeautifulSoup(html, "html5lib")
+    # bs4 tree builder, None picks `default_html_parser()`. "html5lib" parses the whole page the
+    # way a browser does, the other builders only keep the tables, where the card information is.
+    # They repair broken markup differently, so a page where they find no card is parsed again with html5lib.
+    parser = None  # type: Optional[str]
+
+    @classmethod
+    def _make_soup(cls, html: str, parser: str = None) -> "BeautifulSoup":
+        from bs4 import BeautifulSoup, SoupStrainer
+        parser = parser or cls.parser or default_html_parser()
+        if parser == "html5lib":
+            return BeautifulSoup(html, parser)
+        return BeautifulSoup(html, parser, parse_only=SoupStrainer("table"))
 
     @staticmethod
-    def pick_best_matching_card(name: str, card_info_seq: Iterable[Tuple[Tag, Tag, Tag]]) \
-            -> Tuple[Tag, Tag, Tag]:
+    def pick_best_matching_card(name: str, card_info_seq: Iterable[Tuple["Tag", "Tag", "Tag"]]) \
+            -> Tuple["Tag", "Tag", "Tag"]:
         def get_relative_match(match: str):
             return difflib.SequenceMatcher(None, match.lower(), name.lower()).ratio()
 
@@ -39,7 +70,7 @@ class HTMLAnalyzer:
             raise ValueError("card '{0}' not found".format(name))
 
     @staticmethod
-    def unpack_cardtable(cardtable) -> Tuple[Tag, Tag, Tag]:
+    def unpack_cardtable(cardtable) -> Tuple["Tag", "Tag", "Tag"]:
         search = cardtable
         tb = search.find("tbody", recursive=False)
         if tb is not None:
@@ -51,8 +82,8 @@ class HTMLAnalyzer:
         return img, info, ex_info
 
     @classmethod
-    def safe_unpack_cardtables(cls, cardtables: Iterable[Tag]) \
-            -> Generator[Tuple[Tag, Tag, Tag], None, None]:
+    def safe_unpack_cardtables(cls, cardtables: Iterable["Tag"]) \
+            -> Generator[Tuple["Tag", "Tag", "Tag"], None, None]:
         for table in cardtables:
             try:
                 yield cls.unpack_cardtable(table)
@@ -68,9 +99,18 @@ class HTMLAnalyzer:
         self._img_tag = None  # type:Optional[Tag]
         self._ex_info_tag = None  # type:Optional[Tag]
         self._is_english = None  # type:Optional[bool]
-        self._card_table_tuple_ = self._find_and_unpack_best_card_table()  # early catching error in loading
+        self._main_link = None  # type:Optional[Tag]
+        self._rules_line = None  # type:Optional[str]
+        self._chapters = None  # type:Optional[List[Tuple[str, List[str]]]]
+        try:
+            self._card_table_tuple_ = self._find_and_unpack_best_card_table()  # early catching error in loading
+        except ValueError:
+            if (self.parser or default_html_parser()) == "html5lib":
+                raise
+            self._soup = self._make_soup(html, "html5lib")
+            self._card_table_tuple_ = self._find_and_unpack_best_card_table()
 
-    def _find_and_unpack_best_card_table(self) -> Tuple[Tag, Tag, Tag]:
+    def _find_and_unpack_best_card_table(self) -> Tuple["Tag", "Tag", "Tag"]:
         cardtables = self.find_htmltext_tables()
         card_info_list = self.safe_unpack_cardtables(cardtables)
         if self._cardname is not None:
@@ -81,36 +121,33 @@ class HTMLAnalyzer:
             except StopIteration:
                 raise ValueError("card not found")
 
-    def find_htmltext_tables(self) -> List[Tag]:
-        v = self._soup.find_all('table')
-        v = [tab for tab in v if len(tab.find_all('a')) > 0
-             and len(tab.find_all('img')) > 0
-             and (not tab.has_attr("id") or tab["id"] != "nav")]
-        return v
+    def find_htmltext_tables(self) -> List["Tag"]:
+        return [tab for tab in self._soup.find_all('table')
+                if tab.get("id") != "nav" and tab.find('a') is not None and tab.find('img') is not None]
 
     @property
-    def _card_table_tuple(self) -> Tuple[Tag, Tag, Tag]:
+    def _card_table_tuple(self) -> Tuple["Tag", "Tag", "Tag"]:
         if self._card_table_tuple_ is None:
             self._card_table_tuple_ = self._find_and_unpack_best_card_table()
         return self._card_table_tuple_
 
 
     @property
-    def info_tag(self) -> Tag:
+    def info_tag(self) -> "Tag":
         if self._info_tag is None:
             tup = self._card_table_tuple  # type: Tuple[Tag, Tag, Tag]
             self._img_tag, self._info_tag, self._ex_info_tag = tup
         return self._info_tag
 
     @property
-    def ex_info_tag(self) -> Tag:
+    def ex_info_tag(self) -> "Tag":
         if self._ex_info_tag is None:
             tup = self._card_table_tuple
             self._img_tag, self._info_tag, self._ex_info_tag = tup
         return self._ex_info_tag
 
     @property
-    def img_tag(self) -> Tag:
+    def img_tag(self) -> "Tag":
         if self._img_tag is None:
             tup = self._card_table_tuple
             self._img_tag, self._info_tag, self._ex_info_tag = tup
@@ -124,7 +161,50 @@ class HTMLAnalyzer:
         return self._is_english
 
     def check_is_english_from_main(self) -> bool:
-        return self.info_tag.find("img")["alt"].lower() == "english"
+        self._walk_info_tag()
+        return self._is_english
+
+    def _walk_info_tag(self):
+        """
+        Read the main link (name and edition), the language flag and the rules line in one walk.
+        """
+        if self._main_link is not None:
+            return
+        img = p = None
+        for tag in self.info_tag.descendants:
+            if tag.name == "a" and self._main_link is None:
+                self._main_link = tag
+            elif tag.name == "img" and img is None:
+                img = tag
+            elif tag.name == "p" and p is None:
+                p = tag
+            if self._main_link is not None and img is not None and p is not None:
+                break
+        if self._main_link is None:
+            raise ValueError("card table without link")
+        if self._is_english is None:
+            self._is_english = img is not None and img["alt"].lower() == "english"
+        self._rules_line = p.contents[0] if p is not None else ""
+
+    def _walk_ex_info_tag(self) -> List[Tuple[str, List[str]]]:
+        """
+        Links of every chapter (editions, languages, the other part...) of the extra information, in one walk.
+        """
+        if self._chapters is None:
+            tag = self.ex_info_tag
+            while not tag.string:
+                tag = tag.find(True, recursive=False)
+            self._chapters = []
+            for child in tag.parent.children:
+                if child.name == "u":
+                    self._chapters.append((child.get_text().lower(), []))
+                elif child.name == "a" and self._chapters:
+                    self._chapters[-1][1].append(child["href"])
+        return self._chapters
+
+    def _chapter_links(self, name: str) -> List[str]:
+        name = name.lower()
+        return next((links for chapter, links in self._walk_ex_info_tag() if name in chapter), [])
 
     def analyse_main_rules(self) \
             -> Tuple[str,
@@ -133,8 +213,7 @@ class HTMLAnalyzer:
         cls = type(self)
         english = self.is_english
         info_tag = self.info_tag
-        line = info_tag.find("p")
-        linestr = line.contents[0]
+        linestr = self._rules_line
         m = re.match("^\s*(.*?),?\s*\n\s*(.*?)\s*(\n*\s*)?$", linestr)
         type_line = m.group(1)
         mana_string = m.group(2)
@@ -148,33 +227,8 @@ class HTMLAnalyzer:
         super_types, main_types, sub_types = cls._analyse_type_line(type_line)
         return mana_string, pt, (super_types, main_types, sub_types)
 
-    def _find_extra_info_chapter(self, name: str) -> Tuple[Tag, Tag]:
-        name = name.lower()
-        tag = self.ex_info_tag
-        while not tag.string:
-            tt = tag.find_all(True, recursive=False)
-            tag = tt[0]
-        parent_tag = tag.parent
-        tags = parent_tag.find_all("u")
-
-        start, n = next((tag, n) for n, tag in enumerate(tags)
-                        if name in tag.get_text().lower())
-        if n < len(tags):
-            end = tags[n + 1]
-        else:
-            end = None
-        return start, end
-
     def get_other_part_links(self) -> Generator[str, None, None]:
-        start, end = self._find_extra_info_chapter("the other part")
-        curtag = start
-        while True:
-            curtag = curtag.next_sibling
-            if curtag != end:
-                if curtag.name == "a":
-                    yield curtag["href"]
-            else:
-                break
+        yield from self._chapter_links("the other part")
 
 
     def get_card_parts(self):
@@ -182,21 +236,15 @@ class HTMLAnalyzer:
         analyse_hyperref()
 
     def get_other_edition_links(self) -> Generator[str, None, None]:
-        start, end = self._find_extra_info_chapter("editions")
-        curtag = start
-        while True:
-            curtag = curtag.next_sibling
-            if curtag != end:
-                if curtag.name == "a":
-                    yield curtag["href"]
-            else:
-                break
+        yield from self._chapter_links("editions")
 
     def get_main_edition_link(self) -> str:
-        return self.info_tag.find("a")["href"]
+        self._walk_info_tag()
+        return self._main_link["href"]
 
     def get_main_name(self) -> str:
-        return self.info_tag.find("a").string
+        self._walk_info_tag()
+        return self._main_link.string
 
 
     @staticmethod
@@ -237,10 +285,13 @@ class HTMLAnalyzer:
         yield from self.get_other_edition_links()
 
     def get_all_editions(self) -> Generator[Tuple[str, str, int, Optional[str]], None, None]:
-        urls = self.find_card_urls()
-        card_infos = (analyse_hyperref(url) for url in urls)
-        return ((get_mtgset_codes().get(edition, edition), lan, colnum, other_part)
-                for edition, lan, colnum, other_part in card_infos)
+        return editions_from_urls(self.find_card_urls())
+
+
+def editions_from_urls(urls: Iterable[str]) -> Generator[Tuple[str, str, int, Optional[str]], None, None]:
+    card_infos = (analyse_hyperref(url) for url in urls)
+    return ((get_mtgset_codes().get(edition, edition), lan, colnum, other_part)
+            for edition, lan, colnum, other_part in card_infos)
 
 
 def raw_analyser_hyperref(href: str) -> Tuple[str, str, str]:
@@ -262,16 +313,112 @@ def analyse_hyperref(href: str) -> Tuple[str, str, int, Optional[str]]:
     return edition, language, number, other_part
 
 
+class CardRecord:
+    """
+    What is read from a card page, answering the same queries as `HTMLAnalyzer`. Unlike the
+    analyzer it holds no soup, so it is small and can be sent back by a parsing process.
+    """
+    def __init__(self, name: str, card_urls: List[str], is_english: bool = True, mana: str = None,
+                 pt: Optional[Tuple[int, int]] = None,
+                 types: Tuple[List[str], List[str], List[str]] = None, other_part_links: List[str] = None):
+        self.name = name
+        self.card_urls = card_urls
+        self.is_english = is_english
+        self.mana = mana
+        self.pt = pt
+        self.types = types
+        self.other_part_links = other_part_links or []
+
+    @classmethod
+    def from_analyzer(cls, analyzer: HTMLAnalyzer) -> "CardRecord":
+        try:
+            mana, pt, types = analyzer.analyse_main_rules()
+        except (AttributeError, IndexError, TypeError):
+            # the names and editions are still usable without the rules
+            mana, pt, types = None, None, None
+        return cls(str(analyzer.get_main_name()), list(analyzer.find_card_urls()), analyzer.is_english,
+                   mana, pt, types, list(analyzer.get_other_part_links()))
+
+    def get_main_name(self) -> str:
+        return self.name
+
+    def get_main_edition_link(self) -> str:
+        return self.card_urls[0]
+
+    def get_other_edition_links(self) -> Generator[str, None, None]:
+        yield from self.card_urls[1:]
+
+    def get_other_part_links(self) -> Generator[str, None, None]:
+        yield from self.other_part_links
+
+    def find_card_urls(self) -> Generator[str, None, None]:
+        yield from self.card_urls
+
+    def get_all_editions(self) -> Generator[Tuple[str, str, int, Optional[str]], None, None]:
+        return editions_from_urls(self.card_urls)
+
+    def analyse_main_rules(self) \
+            -> Tuple[str,
+                     Optional[Tuple[int, int]],
+                     Tuple[List[str], List[str], List[str]]]:
+        if self.types is None:
+            raise ValueError("rules of '{0}' not found".format(self.name))
+        return self.mana, self.pt, self.types
+
+
+CardInfoTy = Union[HTMLAnalyzer, CardRecord]
+ParsedTy = TypeVar("ParsedTy")
+
+
+def parse_card_page(content: bytes, encoding: Optional[str], cardname: str = None) -> CardRecord:
+    """
+    Parse a downloaded page, in the calling thread or in a worker process.
+    """
+    return CardRecord.from_analyzer(HTMLAnalyzer(content.decode(encoding or "utf-8", errors="replace"), cardname))
+
+
+METRIC_DESCRIPTIONS = {
+    "page_requests_total": "Card and query pages requested",
+    "page_bytes_total": "Bytes of card and query pages received",
+    "page_cache_hits_total": "Page lookups answered from the page cache",
+    "page_cache_misses_total": "Page lookups not in the page cache",
+    "page_request_seconds": "Latency of page requests",
+    "parse_seconds": "Time spent parsing card pages",
+    "retries_total": "Pages and scans requested again after a failure",
+    "scan_requests_total": "Card scans requested",
+    "scan_downloads_total": "Card scans downloaded",
+    "scan_bytes_total": "Bytes of card scans received",
+    "scan_download_seconds": "Latency of scan downloads",
+    "image_cache_hits_total": "Card images found in the figure folder",
+}
+
+
 class CardDownloader:
-    def __init__(self, source: str = "http://magiccards.info"):
+    def __init__(self, source: str = None, parse_processes: int = None):
+        import requests
         self.session = requests.session()
-        self.source = source
+        self.source = source or DEFAULT_SOURCE
+        self.parse_processes = DEFAULT_PARSE_PROCESSES if parse_processes is None else parse_processes
+        self._parse_pool = None  # type: Optional[ProcessPoolExecutor]
+        self._pool_lock = threading.Lock()
+        self.metrics = metrics.Metrics(descriptions=METRIC_DESCRIPTIONS)
+        self._local = threading.local()
 
-    @functools.lru_cache(maxsize=512)
     def load_magic_card(self, name: str = None, edition: str = None,
                         collectors_number: str = None, language: str = None) \
-            -> requests.Response:
+            -> "requests.Response":
+        self._local.requested = False
+        res = self._cached_load_magic_card(name, edition, collectors_number, language)
+        self.metrics.inc("page_cache_misses_total" if self._local.requested else "page_cache_hits_total")
+        return res
+
+    @functools.lru_cache(maxsize=512)
+    def _cached_load_magic_card(self, name: str = None, edition: str = None,
+                                collectors_number: str = None, language: str = None) \
+            -> "requests.Response":
+        self._local.requested = True
         if self.session is None:
+            import requests
             session = requests
         else:
             session = self.session
@@ -282,8 +429,11 @@ class CardDownloader:
         else:
             url, payload = self._get_lookup_url(name, edition, language)
 
-        res = session.get(url, params=payload)
-        logger.debug("Lookup url: {0}".format(res.url))
+        with self.metrics.time("page_request_seconds"):
+            res = session.get(url, params=payload)
+        logger.debug("Lookup url: %s", msg_args=(res.url,))
+        self.metrics.inc("page_requests_total")
+        self.metrics.inc("page_bytes_total", len(res.content))
         res.raise_for_status()
         return res
 
@@ -305,17 +455,67 @@ class CardDownloader:
         url = self.source + "/query"
         return url, payload
 
-    def make_html_analyzer(self, name: str = None, edition: str = None,
-                           collectors_number: str = None, language: str = None) \
-            -> HTMLAnalyzer:
+    def _load_parsed(self, parse: Callable[["requests.Response"], ParsedTy], name: str = None,
+                     edition: str = None, collectors_number: str = None, language: str = None) -> ParsedTy:
         res = self.load_magic_card(name, edition, collectors_number, language)
         try:
-            analyser = HTMLAnalyzer(res.text, cardname=name)
+            with self.metrics.time("parse_seconds"):
+                return parse(res)
         except ValueError:
-            if collectors_number and re.match(r"^\d+[a-zA-Z]$", collectors_number):
+            if not collectors_number or re.match(r"^\d+[a-zA-Z]$", collectors_number):
                 raise
             else:
                 logger.info(verbose_msg="Trying special card number")
+                self.metrics.inc("retries_total")
                 res = self.load_magic_card(name, edition, collectors_number + 'a', language)
-                analyser = HTMLAnalyzer(res.text, cardname=name)
-        return analyser
+                with self.metrics.time("parse_seconds"):
+                    return parse(res)
+
+    def make_html_analyzer(self, name: str = None, edition: str = None,
+                           collectors_number: str = None, language: str = None) \
+            -> HTMLAnalyzer:
+        return self._load_parsed(lambda res: HTMLAnalyzer(res.text, cardname=name),
+                                 name, edition, collectors_number, language)
+
+    def load_card_record(self, name: str = None, edition: str = None,
+                         collectors_number: str = None, language: str = None) \
+            -> CardRecord:
+        """
+        Like `make_html_analyzer`, but the page is parsed by the worker processes when there are some,
+        so parsing does not hold the downloading threads.
+        """
+        return self._load_parsed(lambda res: self._parse_record(res, name),
+                                 name, edition, collectors_number, language)
+
+    def _parse_record(self, res: "requests.Response", name: str = None) -> CardRecord:
+        pool = self.parse_pool
+        if pool is None:
+            return parse_card_page(res.content, res.encoding, name)
+        return pool.submit(parse_card_page, res.content, res.encoding, name).result()
+
+    @property
+    def parse_pool(self) -> Optional["ProcessPoolExecutor"]:
+        if self.parse_processes < 1:
+            return None
+        with self._pool_lock:
+            if self._parse_pool is None:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                # forking a process with downloading threads could copy locks they hold
+                self._parse_pool = ProcessPoolExecutor(self.parse_processes,
+                                                       mp_context=multiprocessing.get_context("spawn"))
+            return self._parse_pool
+
+    def close(self):
+        with self._pool_lock:
+            if self._parse_pool is not None:
+                self._parse_pool.shutdown()
+                self._parse_pool = None
+
+
+@functools.lru_cache(maxsize=None)
+def get_shared_downloader() -> CardDownloader:
+    """
+    Downloader shared by every job of the process, so its http session and page cache stay warm.
+    """
+    return CardDownloader()
@@ -229,17 +229,38 @@ class Deck(JSONable):
 
     def output_latex_proxies(self, fname: str, image_files: Dict[Card, str],
                              image_directory: str = "",
-                             template_name: str = "template.tex", **kwargs):
+                             template_name: str = "template.tex", shard_pages: int = None,
+                             previous_cells: Sequence[str] = None,
+                             previous_shards: Mapping[str, Any] = None, **kwargs) -> output.OutputLatex:
         writer = output.OutputLatex(image_directory, **kwargs)
 
         image_list = {image_files[c]: n for c, n in self.full_deck.items() if c in image_files}
-        writer.load_image_list(image_list)
+        writer.load_image_list(image_list, previous_cells)
+        if shard_pages:
+            writer.write_shards(fname, template_name, shard_pages, previous_signatures=previous_shards)
+            return writer
 
         def writer_encapsulation(dck: "Deck", target, *args, **kwargs) -> None:
             writer(target, template_name, *args, **kwargs)
 
         with open(fname, "w") as f:
             self.output_deck(f, writer=writer_encapsulation)
+        return writer
+
+    def output_pdf_proxies(self, fname: str, image_files: Dict[Card, str],
+                           image_directory: str = "", previous_cells: Sequence[str] = None,
+                           **kwargs) -> output.OutputPDF:
+        writer = output.OutputPDF(image_directory, **kwargs)
+
+        image_list = {image_files[c]: n for c, n in self.full_deck.items() if c in image_files}
+        writer.load_image_list(image_list, previous_cells)
+
+        def writer_encapsulation(dck: "Deck", target, *args, **kwargs) -> None:
+            writer(target, *args, **kwargs)
+
+        with open(fname, "wb") as f:
+            self.output_deck(f, writer=writer_encapsulation)
+        return writer
 
     def __add__(self, other: "Deck") -> "Deck":
         return Deck(self.mainboard + other.mainboard, self.sideboard + other.sideboard)
@@ -314,13 +335,12 @@ def exclude_inventory_from_deck(dck: Deck, inventory: Deck) -> Deck:
             for i, t in enumerate(inv_view):
                 (card_ininv, num_ininv) = t
                 if num_ininv > 0 and card_ininv.is_specific(card_indeck):
-                    onum = num_indeck
                     num_removing = min(num_indeck, num_ininv)
                     num_indeck -= num_removing
                     num_ininv -= num_removing
                     inv_view[i] = (card_indeck, num_ininv)
-                    logger.info(verbose_msg="removed {0} times '{1}' for '{2}'"
-                                .format(onum-num_indeck, card_ininv, card_indeck))
+                    logger.info(verbose_msg="removed %d times '%s' for '%s'",
+                                verbose_args=(num_removing, card_ininv, card_indeck))
                 if num_indeck <= 0:
                     break
             if num_indeck > 0:
@@ -348,13 +368,12 @@ def exclude_deck_from_inventory(inventory: Deck, dck: Deck) -> Deck:
             for i, t in enumerate(dck_view):
                 (card_indeck, num_indeck) = t
                 if num_indeck > 0 and card_ininv.is_specific(card_indeck):
-                    onum = num_ininv
                     num_removing = min(num_ininv, num_indeck)
                     num_ininv -= num_removing
                     num_indeck -= num_removing
                     dck_view[i] = (card_indeck, num_indeck)
-                    logger.info(verbose_msg="removed {0} times '{1}' for '{2}'"
-                                .format(onum-num_indeck, card_ininv, card_indeck))
+                    logger.info(verbose_msg="removed %d times '%s' for '%s'",
+                                verbose_args=(num_removing, card_ininv, card_indeck))
                 if num_ininv <= 0:
                     break
             if num_ininv > 0:
@@ -1,23 +1,62 @@
 import sys
 import json
 import abc
-from typing import Any, Dict
+from typing import Any, Dict, Tuple, Generator, Optional
 
 from mylogger import MAINLOGGER
 logger = MAINLOGGER
 
+COMPACT_KEY = "$"
+COMPACT_FIELDS_KEY = "f"
+
+_REGISTRY = {}  # type: Dict[str, type]
+
+
+def _registry_key(cls: type) -> str:
+    return "{0}.{1}".format(cls.__module__, cls.__name__)
+
 
 class JSONable(metaclass=abc.ABCMeta):
+    # order of the fields when stored positionally, empty means no compact form
+    json_fields = ()  # type: Tuple[str, ...]
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        _REGISTRY[_registry_key(cls)] = cls
+
     @abc.abstractmethod
     def to_json(self) -> Dict[str, str]:
         d = {"class": type(self).__name__, "module": type(self).__module__}
         return d
 
+    def to_compact_json(self) -> Any:
+        d = self.to_json()
+        fields = type(self).json_fields
+        if not fields:
+            return d
+        return {COMPACT_KEY: _registry_key(type(self)),
+                COMPACT_FIELDS_KEY: [d[f] for f in fields]}
+
     @classmethod
     def from_json(cls, **kwargs) -> "JSONable":
         return cls(**kwargs)
 
 
+def find_class(module: str, name: str) -> Optional[type]:
+    try:
+        return _REGISTRY[module + "." + name]
+    except KeyError:
+        pass
+    try:
+        cls = getattr(sys.modules[module], name)
+    except (KeyError, AttributeError) as a:
+        logger.warning(verbose_msg=str(a))
+        return None
+    if isinstance(cls, type) and issubclass(cls, JSONable):
+        _REGISTRY[_registry_key(cls)] = cls
+    return cls
+
+
 class JSONEncoder(json.JSONEncoder):
     def default(self, o):
         try:
@@ -26,21 +65,37 @@ class JSONEncoder(json.JSONEncoder):
             return super().default(o)
 
 
+class CompactJSONEncoder(json.JSONEncoder):
+    def default(self, o):
+        try:
+            return o.to_compact_json()
+        except AttributeError:
+            return super().default(o)
+
+
+def _decode_compact(o: Dict[str, Any]) -> Any:
+    module, _, name = o[COMPACT_KEY].rpartition(".")
+    cls = find_class(module, name)
+    if cls is None:
+        return o
+    try:
+        return cls.from_json(**dict(zip(cls.json_fields, o[COMPACT_FIELDS_KEY])))
+    except AttributeError as a:
+        logger.warning(verbose_msg=str(a))
+    return o
+
+
 def json_decoder(o):
     if "class" in o and "module" in o:
-        try:
-            m = o["module"]
-            c = o["class"]
-            cls = getattr(sys.modules[m], c)
-        except AttributeError as a:
-            logger.warning(verbose=str(a))
-        else:
-            del o["class"]
-            del o["module"]
+        cls = find_class(o["module"], o["class"])
+        if cls is not None:
+            kwargs = {k: v for k, v in o.items() if k != "class" and k != "module"}
             try:
-                return cls.from_json(**o)
+                return cls.from_json(**kwargs)
             except AttributeError as a:
-                logger.warning(verbose=str(a))
+                logger.warning(verbose_msg=str(a))
+    elif COMPACT_KEY in o:
+        return _decode_compact(o)
     return o
 
 
@@ -52,9 +107,92 @@ def load_file(fp) -> Any:
     return json.load(fp, object_hook=json_decoder)
 
 
-def dump_string(obj) -> str:
-    return json.dumps(obj, cls=JSONEncoder)
-
-
-def dump_file(obj, fp):
-    json.dump(obj, fp, cls=JSONEncoder)
+def dump_string(obj, compact: bool = False) -> str:
+    return json.dumps(obj, cls=CompactJSONEncoder if compact else JSONEncoder)
+
+
+def dump_file(obj, fp, compact: bool = False):
+    json.dump(obj, fp, cls=CompactJSONEncoder if compact else JSONEncoder)
+
+
+class _StreamBuffer:
+    """
+    Text buffer over a file object that is refilled on demand, so a json document can be
+    decoded piece by piece with `json.JSONDecoder.raw_decode`.
+    """
+    def __init__(self, fp, chunk_size: int):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.fp.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\n\r":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError("Expecting '{0}' at position {1}".format(char, self.pos))
+        self.pos += 1
+
+    def decode(self, decoder: json.JSONDecoder) -> Any:
+        self.peek()
+        while True:
+            try:
+                obj, end = decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+            else:
+                # a number may continue in the next chunk
+                if end < len(self.buf) or self.eof or not self.fill():
+                    self.pos = end
+                    return obj
+
+
+def iter_load_file(fp, chunk_size: int = 1 << 16) -> Generator[Tuple[str, Any], None, None]:
+    """
+    Decode a json object incrementally, yielding `(key, value)` for every member.
+    Members that are arrays are not loaded at once: every element is yielded
+    separately as `(key, element)`.
+    """
+    decoder = json.JSONDecoder(object_hook=json_decoder)
+    stream = _StreamBuffer(fp, chunk_size)
+    stream.expect("{")
+    if stream.peek() == "}":
+        return
+    while True:
+        key = stream.decode(decoder)
+        stream.expect(":")
+        if stream.peek() == "[":
+            stream.expect("[")
+            if stream.peek() != "]":
+                while True:
+                    yield key, stream.decode(decoder)
+                    if stream.peek() != ",":
+                        break
+                    stream.expect(",")
+            stream.expect("]")
+        else:
+            yield key, stream.decode(decoder)
+        if stream.peek() != ",":
+            break
+        stream.expect(",")
+    stream.expect("}")
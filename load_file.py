@@ -1,15 +1,17 @@
 import csv
+import io
 import itertools
 import operator
 import re
 import typing
 from typing import Iterable, Sequence, AnyStr
-from typing import Optional, Callable, Tuple
+from typing import Optional, Callable, Tuple, Generator, Dict, Any
 
 import mylogger
 from card import Card
 from proxybuilder_types import CardCountSecTy, CardListTy, ReadLineFuncTy, CardCountTy, ReadFuncTy
-from export.jsonencoders import load_file, load_string
+from proxybuilder_types import IterFuncTy
+from export.jsonencoders import iter_load_file, load_string
 
 
 def read_file(file: Iterable, line_process: ReadLineFuncTy,
@@ -24,6 +26,23 @@ def read_file(file: Iterable, line_process: ReadLineFuncTy,
     return t[0], t[1]
 
 
+def iter_file(file: Iterable, line_process: ReadLineFuncTy,
+              *args: any, **kwargs: any) \
+        -> Generator[CardCountSecTy, None, None]:
+    """
+    Streaming counterpart of `read_file`: yields the rows one by one.
+    The section flag is normalized, cards in the same section as the first card are main deck.
+    """
+    first_section = None
+    for row in file:
+        item = line_process(row, *args, **kwargs)
+        if item:
+            c, n, section = item
+            if first_section is None:
+                first_section = section
+            yield c, n, section == first_section
+
+
 def process_deckbox_deck_row(row: Tuple[AnyStr, ...]) -> Optional[CardCountSecTy]:
     try:
         return Card(row[1].lower()), int(row[0]), True if row[2].lower() == "main" else False
@@ -94,6 +113,21 @@ def read_csv(file: typing.TextIO, name_column: int = 1, count_column: int = 0,
                                                              ))
 
 
+def iter_csv(file: typing.TextIO, name_column: int = 1, count_column: int = 0,
+             section_column: int = None, version_column: int = None,
+             collectors_num_column: int = None, language_column: int = None, *args, **kwargs) \
+        -> Generator[CardCountSecTy, None, None]:
+    csvreader = csv.reader(file, *args, **kwargs)
+    return iter_file(csvreader, lambda line: process_csv_row(line,
+                                                             name_column,
+                                                             count_column,
+                                                             version_column=version_column,
+                                                             section_column=section_column,
+                                                             collectors_num_column=collectors_num_column,
+                                                             language_column=language_column
+                                                             ))
+
+
 class HandleTextline:
     def __init__(self, mb_check: str = r"main(\s*(board|deck))?\s*([([{<]\d+[]>})]\s*)?:?",
                  sb_check: str = r"^side(\s*board)?\s*([([{]\d+[]})]\s*)?:?",
@@ -151,10 +185,21 @@ def read_txt(file: typing.TextIO, line_reader: HandleTextline=None) \
     return read_file(file, line_reader)
 
 
+def iter_txt(file: typing.TextIO, line_reader: HandleTextline=None) \
+        -> Generator[CardCountSecTy, None, None]:
+    if line_reader is None:
+        line_reader = HandleTextline()
+    return iter_file(file, line_reader)
+
+
 def read_json(file: typing.TextIO) \
         -> Tuple[CardListTy, CardListTy]:
-    l = load_file(file)
-    return l["mainboard"], l["sideboard"]
+    sections = {"mainboard": [], "sideboard": []}
+    for key, item in iter_load_file(file):
+        if key in sections:
+            c, n = item
+            sections[key].append((c, n))
+    return sections["mainboard"], sections["sideboard"]
 
 
 class HandleXmageLine:
@@ -189,6 +234,13 @@ def read_xmage_deck(file: typing.TextIO, line_reader: HandleXmageLine=None) \
     return read_file(file, line_reader)
 
 
+def iter_xmage_deck(file: typing.TextIO, line_reader: HandleXmageLine=None) \
+        -> Generator[CardCountSecTy, None, None]:
+    if line_reader is None:
+        line_reader = HandleXmageLine()
+    return iter_file(file, line_reader)
+
+
 def sniff_xmage(sample: Sequence) -> Callable[[str], Optional[CardCountSecTy]]:
     midlines = HandleXmageLine()
     firstline = HandleXmageLine("name:.*")
@@ -221,13 +273,55 @@ def sniff_json(sample: Sequence) -> bool:
     return True
 
 
-def sniff_reader(file: typing.TextIO, num: int = 40) -> ReadFuncTy:
-    pos = file.tell()
+class PrefixedStream:
+    """
+    Non seekable text stream of which the start was already read (e.g. for sniffing).
+    The consumed prefix is replayed before the remainder of the stream.
+    """
+    def __init__(self, prefix: str, stream: typing.TextIO):
+        self._prefix = io.StringIO(prefix)
+        self._stream = stream
+        self.name = getattr(stream, "name", "")
+
+    def read(self, size: int = -1) -> str:
+        data = self._prefix.read(size)
+        if size is None or size < 0:
+            return data + self._stream.read()
+        if len(data) < size:
+            data += self._stream.read(size - len(data))
+        return data
+
+    def readline(self) -> str:
+        line = self._prefix.readline()
+        if not line.endswith("\n"):
+            line += self._stream.readline()
+        return line
+
+    def __iter__(self):
+        return iter(self.readline, "")
+
+
+_SNIFFED_READERS = {"txt": read_txt, "xmage": read_xmage_deck, "csv": read_csv, "json": read_json}
+_SNIFFED_ITERATORS = {"txt": iter_txt, "xmage": iter_xmage_deck, "csv": iter_csv}
+
+
+def _sniff_format(file: typing.TextIO, num: int = 40) -> Tuple[str, Dict[str, Any], typing.TextIO]:
+    """
+    Guess the format of a deck file from its first lines.
+    Returns the format name, the keyword arguments for its reader and the stream to read from.
+    """
+    seekable = file.seekable()
+    if seekable:
+        pos = file.tell()
     header = file.readline()
-    sample = header + "".join(itertools.islice(file, num - 1))  # read first N lines to sniff
-    ret = None
+    if seekable:
+        sample = header + "".join(itertools.islice(file, num - 1))  # read first N lines to sniff
+        file.seek(pos)
+    else:
+        sample = header + "".join(file.readline() for _ in range(num - 1))
+        file = PrefixedStream(sample, file)
     try:
-        b = sniff_json(sample)
+        sniff_json(sample)
     except ValueError:
         try:
             dialect = csv.Sniffer().sniff(sample, (";", ","))
@@ -237,10 +331,10 @@ def sniff_reader(file: typing.TextIO, num: int = 40) -> ReadFuncTy:
             except ValueError:
                 linereader = sniff_plain(sample.splitlines())
                 mylogger.MAINLOGGER.info("Plain text guessed")
-                ret = lambda fp: read_txt(fp, line_reader=linereader)
+                return "txt", {"line_reader": linereader}, file
             else:
                 mylogger.MAINLOGGER.info("Xmage save file guessed")
-                ret = lambda fp: read_xmage_deck(fp, line_reader=linereader)
+                return "xmage", {"line_reader": linereader}, file
         else:
             mylogger.MAINLOGGER.info("CSV input guessed")
             v = csv.reader([header], dialect=dialect)
@@ -263,23 +357,46 @@ def sniff_reader(file: typing.TextIO, num: int = 40) -> ReadFuncTy:
                 language_column = line.index("language")
             except ValueError:
                 language_column = None
-
-            ret = lambda file: read_csv(file,
-                                        name_column=name_column,
-                                        count_column=count_column,
-                                        version_column=version_column,
-                                        section_column=section_column,
-                                        collectors_num_column=collectors_num_column,
-                                        language_column=language_column,
-                                        dialect=dialect)
+            return "csv", {"name_column": name_column,
+                           "count_column": count_column,
+                           "version_column": version_column,
+                           "section_column": section_column,
+                           "collectors_num_column": collectors_num_column,
+                           "language_column": language_column,
+                           "dialect": dialect}, file
     else:
         mylogger.MAINLOGGER.info("JSON file guessed")
-        ret = lambda fp: read_json(fp)
-    file.seek(pos)
-    return ret
+        return "json", {}, file
+
+
+def sniff_reader(file: typing.TextIO, num: int = 40) -> ReadFuncTy:
+    fmt, kwargs, _ = _sniff_format(file, num)
+    reader = _SNIFFED_READERS[fmt]
+    return lambda fp: reader(fp, **kwargs)
+
+
+def sniff_stream(file: typing.TextIO, num: int = 40) \
+        -> Tuple[Optional[IterFuncTy], ReadFuncTy, typing.TextIO]:
+    """
+    Guess the format of `file`, which does not need to be seekable.
+    Returns a function iterating its rows (None if the format is not line oriented),
+    a function reading it as a whole and the stream to pass them.
+    """
+    fmt, kwargs, file = _sniff_format(file, num)
+    reader = _SNIFFED_READERS[fmt]
+    iterator = _SNIFFED_ITERATORS.get(fmt)
+    if iterator is None:
+        return None, lambda fp: reader(fp, **kwargs), file
+    return (lambda fp: iterator(fp, **kwargs)), (lambda fp: reader(fp, **kwargs)), file
+
+
+def find_line_iterator(reader: ReadFuncTy) -> Optional[IterFuncTy]:
+    return {read_csv: iter_csv,
+            read_txt: iter_txt,
+            read_xmage_deck: iter_xmage_deck}.get(reader)
 
 
 def read_any_file(file: typing.TextIO) \
         -> Tuple[CardListTy, CardListTy]:
-    reader = sniff_reader(file)
-    return reader(file)
+    fmt, kwargs, file = _sniff_format(file)
+    return _SNIFFED_READERS[fmt](file, **kwargs)
@@ -0,0 +1,100 @@
+import bisect
+import contextlib
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import AnyStr, Dict, Sequence, Tuple
+
+# upper bounds (s) of the latency buckets, as used by the prometheus clients
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def format_value(value: float) -> str:
+    return str(int(value)) if value == int(value) else repr(value)
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self) -> Tuple[Tuple[float, int], ...]:
+        total = 0
+        out = []
+        for bound, n in zip(self.buckets + (float("inf"),), self.bucket_counts):
+            total += n
+            out.append((bound, total))
+        return tuple(out)
+
+
+class Metrics:
+    """
+    Thread safe counters and latency histograms, exported in the prometheus text format.
+    """
+    def __init__(self, prefix: str = "proxybuilder", descriptions: Dict[str, str] = None):
+        self.prefix = prefix
+        self.descriptions = descriptions or {}
+        self.lock = threading.Lock()
+        self.counters = Counter()  # type: Dict[str, float]
+        self.histograms = OrderedDict()  # type: Dict[str, Histogram]
+
+    def inc(self, name: str, n: float = 1):
+        with self.lock:
+            self.counters[name] += n
+
+    def observe(self, name: str, value: float):
+        with self.lock:
+            try:
+                histogram = self.histograms[name]
+            except KeyError:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(value)
+
+    @contextlib.contextmanager
+    def time(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def counter(self, name: str) -> float:
+        with self.lock:
+            return self.counters[name]
+
+    def snapshot(self) -> Dict[str, float]:
+        with self.lock:
+            return dict(self.counters)
+
+    def _header(self, name: str, kind: str):
+        lines = []
+        if name in self.descriptions:
+            lines.append("# HELP {0}_{1} {2}".format(self.prefix, name, self.descriptions[name]))
+        lines.append("# TYPE {0}_{1} {2}".format(self.prefix, name, kind))
+        return lines
+
+    def to_prometheus(self) -> str:
+        lines = []
+        with self.lock:
+            for name, value in sorted(self.counters.items()):
+                lines.extend(self._header(name, "counter"))
+                lines.append("{0}_{1} {2}".format(self.prefix, name, format_value(value)))
+            for name, histogram in self.histograms.items():
+                lines.extend(self._header(name, "histogram"))
+                for bound, n in histogram.cumulative_counts():
+                    lines.append('{0}_{1}_bucket{{le="{2}"}} {3}'.format(
+                        self.prefix, name, "+Inf" if bound == float("inf") else format_value(bound), n))
+                lines.append("{0}_{1}_sum {2}".format(self.prefix, name, repr(histogram.sum)))
+                lines.append("{0}_{1}_count {2}".format(self.prefix, name, histogram.count))
+        return "\n".join(lines) + "\n"
+
+    def save_prometheus(self, fname: AnyStr):
+        with open(fname, "w") as f:
+            f.write(self.to_prometheus())
@@ -1,9 +1,45 @@
-from typing import AnyStr, Union
+from typing import Any, AnyStr, Callable, Dict, List, Optional, Union
+import copy
+import json
 import logging
+import logging.handlers
+import queue
 import sys
 
+# a message, or a callable building it
+MessageTy = Union[AnyStr, Callable[[], Any], Any]
+
+
+class LazyMessage:
+    """
+    Log message only built when a handler formats the record: `msg` may be a callable
+    returning the message, `args` are applied to it %-style.
+    """
+    __slots__ = ("msg", "args")
+
+    def __init__(self, msg: Any, args: tuple = ()):
+        self.msg = msg
+        self.args = args
+
+    def __str__(self) -> str:
+        msg = str(self.msg() if callable(self.msg) else self.msg)
+        if self.args:
+            return msg % self.args
+        return msg
+
+
+def _deferred(msg: Any, args: tuple) -> Any:
+    if args or callable(msg):
+        return LazyMessage(msg, args)
+    return msg
+
 
 class Logger(logging.Logger):
+    """
+    Logger with a second, verbose only, message per call. Both messages may be callables or
+    take their %-style arguments from `msg_args` and `verbose_args`, so that building them
+    costs nothing when the record is not emitted.
+    """
     def __init__(self, name: AnyStr = None, verbose: bool = None,
                  *args, **kwargs):
         if verbose is None:
@@ -11,48 +47,41 @@ class Logger(logging.Logger):
         super().__init__(name, *args, **kwargs)
         self.verbose = verbose
 
-    def log(self, level: Union[AnyStr, int], msg: AnyStr = None,
-            verbose_msg: AnyStr = None,
-            *args, **kwargs):
+    def _log_messages(self, level: int, msg: MessageTy, verbose_msg: MessageTy, args: tuple,
+                      msg_args: tuple, verbose_args: tuple, kwargs: Dict[str, Any]):
+        if not self.isEnabledFor(level):
+            return
         if msg is not None:
-            super().log(level, msg, *args, **kwargs)
+            self._log(level, _deferred(msg, msg_args), args, **kwargs)
         if self.verbose and verbose_msg is not None:
-            super().log(level, verbose_msg, *args, **kwargs)
+            self._log(level, _deferred(verbose_msg, verbose_args), args, **kwargs)
 
-    def info(self, msg: AnyStr = None, verbose_msg: AnyStr = None,
-             *args, **kwargs):
-        if msg is not None:
-            super().info(msg, *args, **kwargs)
-        if self.verbose and verbose_msg is not None:
-            super().info(verbose_msg, *args, **kwargs)
+    def log(self, level: Union[AnyStr, int], msg: MessageTy = None,
+            verbose_msg: MessageTy = None,
+            *args, msg_args: tuple = (), verbose_args: tuple = (), **kwargs):
+        if isinstance(level, str):
+            level = logging.getLevelName(level.upper())
+        self._log_messages(level, msg, verbose_msg, args, msg_args, verbose_args, kwargs)
 
-    def debug(self, msg: AnyStr = None, verbose_msg: AnyStr = None,
-              *args, **kwargs):
-        if msg is not None:
-            super().debug(msg, *args, **kwargs)
-        if self.verbose and verbose_msg is not None:
-            super().debug(verbose_msg, *args, **kwargs)
+    def info(self, msg: MessageTy = None, verbose_msg: MessageTy = None,
+             *args, msg_args: tuple = (), verbose_args: tuple = (), **kwargs):
+        self._log_messages(logging.INFO, msg, verbose_msg, args, msg_args, verbose_args, kwargs)
 
-    def warning(self, msg: AnyStr = None, verbose_msg: AnyStr = None,
-                *args, **kwargs):
-        if msg is not None:
-            super().warning(msg, *args, **kwargs)
-        if self.verbose and verbose_msg is not None:
-            super().warning(verbose_msg, *args, **kwargs)
+    def debug(self, msg: MessageTy = None, verbose_msg: MessageTy = None,
+              *args, msg_args: tuple = (), verbose_args: tuple = (), **kwargs):
+        self._log_messages(logging.DEBUG, msg, verbose_msg, args, msg_args, verbose_args, kwargs)
 
-    def error(self, msg: AnyStr = None, verbose_msg: AnyStr = None,
-              *args, **kwargs):
-        if msg is not None:
-            super().error(msg, *args, **kwargs)
-        if self.verbose and verbose_msg is not None:
-            super().error(verbose_msg, *args, **kwargs)
+    def warning(self, msg: MessageTy = None, verbose_msg: MessageTy = None,
+                *args, msg_args: tuple = (), verbose_args: tuple = (), **kwargs):
+        self._log_messages(logging.WARNING, msg, verbose_msg, args, msg_args, verbose_args, kwargs)
 
-    def critical(self, msg: AnyStr = None, verbose_msg: AnyStr = None,
-                 *args, **kwargs):
-        if msg is not None:
-            super().critical(msg, *args, **kwargs)
-        if self.verbose and verbose_msg is not None:
-            super().critical(verbose_msg, *args, **kwargs)
+    def error(self, msg: MessageTy = None, verbose_msg: MessageTy = None,
+              *args, msg_args: tuple = (), verbose_args: tuple = (), **kwargs):
+        self._log_messages(logging.ERROR, msg, verbose_msg, args, msg_args, verbose_args, kwargs)
+
+    def critical(self, msg: MessageTy = None, verbose_msg: MessageTy = None,
+                 *args, msg_args: tuple = (), verbose_args: tuple = (), **kwargs):
+        self._log_messages(logging.CRITICAL, msg, verbose_msg, args, msg_args, verbose_args, kwargs)
 
 
 class LessThanFilter(logging.Filter):
@@ -63,6 +92,42 @@ class LessThanFilter(logging.Filter):
     def filter(self, record):
         return True if record.levelno < self.max_level else False
 
+class JSONLinesFormatter(logging.Formatter):
+    """
+    One json object per record and line.
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        d = {"time": record.created,
+             "level": record.levelname,
+             "logger": record.name,
+             "thread": record.threadName,
+             "message": record.getMessage()}
+        if record.exc_info:
+            d["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            d["exception"] = record.exc_text
+        return json.dumps(d)
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler keeping the traceback of a record apart from its message, in `exc_text`,
+    where the formatters of the listener find it.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info and not record.exc_text:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+        msg = record.getMessage()
+        record = copy.copy(record)
+        record.message = record.msg = msg
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+_exception_formatter = logging.Formatter()
+
+
 logging.setLoggerClass(Logger)
 
 MAINLOGGER = logging.getLogger("main")
@@ -76,3 +141,48 @@ MAINLOGGER.addHandler(logging_handler_out)
 logging_handler_err = logging.StreamHandler(sys.stderr)
 logging_handler_err.setLevel(logging.WARNING)
 MAINLOGGER.addHandler(logging_handler_err)
+
+_queue_listener = None  # type: Optional[logging.handlers.QueueListener]
+_queue_handler = None  # type: Optional[QueueHandler]
+
+
+def start_queue_logging(log_file: AnyStr = None) -> logging.handlers.QueueListener:
+    """
+    Hand the records of MAINLOGGER to a queue, written by a listener thread to the stdout and
+    stderr handlers (and, as json lines, to `log_file`), so logging never blocks the caller.
+    Messages are built before they are queued, only for records some handler will write.
+    """
+    global _queue_listener, _queue_handler
+    if _queue_listener is not None:
+        stop_queue_logging()
+    handlers = [logging_handler_out, logging_handler_err]  # type: List[logging.Handler]
+    if log_file is not None:
+        file_handler = logging.FileHandler(log_file)
+        file_handler.setLevel(logging.DEBUG if MAINLOGGER.verbose else logging.INFO)
+        file_handler.setFormatter(JSONLinesFormatter())
+        handlers.append(file_handler)
+    _queue_handler = QueueHandler(queue.SimpleQueue())
+    _queue_handler.setLevel(min(h.level for h in handlers))
+    _queue_listener = logging.handlers.QueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+    MAINLOGGER.removeHandler(logging_handler_out)
+    MAINLOGGER.removeHandler(logging_handler_err)
+    MAINLOGGER.addHandler(_queue_handler)
+    _queue_listener.start()
+    return _queue_listener
+
+
+def stop_queue_logging():
+    """
+    Write the records still queued and log synchronously again.
+    """
+    global _queue_listener, _queue_handler
+    if _queue_listener is None:
+        return
+    MAINLOGGER.removeHandler(_queue_handler)
+    _queue_listener.stop()
+    for h in _queue_listener.handlers:
+        if h not in (logging_handler_out, logging_handler_err):
+            h.close()
+    MAINLOGGER.addHandler(logging_handler_out)
+    MAINLOGGER.addHandler(logging_handler_err)
+    _queue_listener = _queue_handler = None
@@ -0,0 +1,64 @@
+import os
+from collections import Counter
+from typing import Dict, List, Any, AnyStr, Optional, Tuple
+
+import mylogger
+from card import Card
+from export.jsonencoders import JSONable, load_file, dump_file
+
+logger = mylogger.MAINLOGGER
+
+
+class BuildState(JSONable):
+    """
+    What a proxy build produced: the proxy list, the image of every card, the order of the
+    proxies on the sheets and the content of every shard. Used to only redo what changed.
+    """
+    def to_json(self):
+        d = super().to_json()
+        d.update({"settings": self.settings,
+                  "proxies": list(self.proxies.items()),
+                  "images": list(self.images.items()),
+                  "cells": self.cells,
+                  "shards": self.shards})
+        return d
+
+    @classmethod
+    def from_json(cls, proxies, images, **kwargs):
+        return cls(proxies=dict(proxies), images=dict(images), **kwargs)
+
+    def __init__(self, settings: Dict[str, Any] = None, proxies: Dict[Card, int] = None,
+                 images: Dict[Card, str] = None, cells: List[str] = None,
+                 shards: Dict[str, Any] = None):
+        self.settings = settings if settings is not None else {}
+        self.proxies = Counter(proxies) if proxies is not None else Counter()
+        self.images = images if images is not None else {}
+        self.cells = cells
+        self.shards = shards if shards is not None else {}
+
+    def delta(self, proxies: Counter) -> Tuple[Counter, Counter]:
+        """
+        Proxies added and removed since this state.
+        """
+        return proxies - self.proxies, self.proxies - proxies
+
+
+def state_filename(output: AnyStr) -> str:
+    return output + ".state.json"
+
+
+def load_build_state(fname: AnyStr) -> Optional[BuildState]:
+    try:
+        with open(fname) as f:
+            state = load_file(f)
+    except (OSError, ValueError) as e:
+        logger.info(verbose_msg="No usable build state (%s): %s", verbose_args=(os.path.abspath(fname), e))
+        return None
+    if not isinstance(state, BuildState):
+        return None
+    return state
+
+
+def save_build_state(fname: AnyStr, state: BuildState):
+    with open(fname, "w") as f:
+        dump_file(state, f, compact=True)
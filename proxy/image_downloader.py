@@ -1,6 +1,7 @@
 import os
 import re
 import shutil
+import time
 import requests
 from typing import Dict, Generator, Iterable, Union
 
@@ -9,6 +10,7 @@ from bs4 import Tag
 import deck
 import card
 import mylogger
+import runreport
 import card_downloader as card_dl
 
 logger = mylogger.MAINLOGGER
@@ -31,15 +33,27 @@ def find_image_url(urliter: Union[Iterable[str], Generator[str, None, None]],
                                          )
 
 
-def get_all_images(names: deck.Deck, output_directory: str, session: card_dl.CardDownloader = None) \
+def get_all_images(names: deck.Deck, output_directory: str, session: card_dl.CardDownloader = None,
+                   known: Dict[card.Card, str] = None) \
         -> Dict[card.Card, str]:
+    """
+    Find or download the image of every card. Cards in `known` (e.g. from a previous run)
+    are not looked up again as long as their image file still exists.
+    """
     logger.info("Loading images...", verbose_msg=os.path.abspath(output_directory))
+    if session is None:
+        session = card_dl.get_shared_downloader()
     outnames = {}
-    view = sorted(names.full_deck.items(), key=lambda x: (x[0].name, x[0].edition), reverse=True)
+    full_deck = names.full_deck
+    if known is not None:
+        outnames.update((c, fname) for c, fname in known.items()
+                        if c in full_deck and os.path.isfile(os.path.join(output_directory, fname)))
+        session.metrics.inc("image_cache_hits_total", len(outnames))
+    view = sorted(full_deck.items(), key=lambda x: (x[0].name, x[0].edition), reverse=True)
     for card, num in view:
         if num > 0 and card not in outnames:
             try:
-                logger.info(verbose_msg="Loading {0}".format(card))
+                logger.info(verbose_msg="Loading %s", verbose_args=(card,))
                 outname = get_image(card, output_directory, session)
                 outnames[card] = outname
             except (requests.exceptions.HTTPError, ValueError):
@@ -53,6 +67,8 @@ def name_to_fname(name: str) -> str:
 
 
 def get_image(card: card.Card, output_directory: str, session: card_dl.CardDownloader = None) -> str:
+    if session is None:
+        session = card_dl.get_shared_downloader()
     os.makedirs(output_directory, exist_ok=True)
     outname = name_to_fname(card.name)
     try:
@@ -67,29 +83,39 @@ def get_image(card: card.Card, output_directory: str, session: card_dl.CardDownl
         existing_fname = next(f for f in os.listdir(output_directory)
                               if os.path.isfile(os.path.join(output_directory, f)) and
                               prog.fullmatch(os.path.splitext(f)[0]))
-        logger.debug("Using existing file \"{0}\"".format(existing_fname))
+        logger.debug("Using existing file \"%s\"", msg_args=(existing_fname,))
+        session.metrics.inc("image_cache_hits_total")
         return existing_fname
     except StopIteration:
-        if session is None:
-            session = card_dl.CardDownloader()
         return download_card_image(card, output_directory, session)
 
 
 def download_card_image(card: card.Card, output_directory: str, session: card_dl.CardDownloader) \
         -> str:
     outname = name_to_fname(card.name)
-    analyzer = session.make_html_analyzer(card.name, card.edition, card.magiccards_info_number_list(), card.language)
-    gen_card_urls = analyzer.find_card_urls()
-    links = find_image_url(gen_card_urls)
+    with runreport.stage("image resolution"):
+        analyzer = session.load_card_record(card.name, card.edition,
+                                            next(card.magiccards_info_number_list(), None), card.language)
+        links = list(find_image_url(analyzer.find_card_urls(), session.source))
+    with runreport.stage("download"):
+        return _download_first_image(links, outname, output_directory, session)
+
+
+def _download_first_image(links: Iterable[str], outname: str, output_directory: str,
+                          session: card_dl.CardDownloader) -> str:
     response = None
     outputfile = None
     # noinspection PyTypeChecker
-    for link in links:
+    for attempt, link in enumerate(links):
         search = re.search(r"/(\w+)/(\w+)\.(\w+)$", link)
         version, num, ext = search.group(1), search.group(2), search.group(3)
         outname += "[{0},{2}].{1}".format(version, ext, num)
         outputfile = output_directory + '/' + outname
+        if attempt > 0:
+            session.metrics.inc("retries_total")
+        start = time.perf_counter()
         response = session.session.get(link, stream=True)
+        session.metrics.inc("scan_requests_total")
         if response.status_code == 200:
             break
     else:
@@ -100,4 +126,8 @@ def download_card_image(card: card.Card, output_directory: str, session: card_dl
         response.raise_for_status()
     with open(outputfile, 'wb') as out_file:
         shutil.copyfileobj(response.raw, out_file)
+        size = out_file.tell()
+    session.metrics.observe("scan_download_seconds", time.perf_counter() - start)
+    session.metrics.inc("scan_downloads_total")
+    session.metrics.inc("scan_bytes_total", size)
     return outname
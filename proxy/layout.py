@@ -0,0 +1,150 @@
+import functools
+import itertools
+import math as m
+from collections import Counter
+from typing import Iterable, List, Generator, TypeVar, Sequence, Mapping, Optional, Tuple
+
+CellTy = TypeVar("CellTy")
+PageTy = List[List[CellTy]]
+
+PORTRAIT = "portrait"
+LANDSCAPE = "landscape"
+
+# printed image size (mm) of the supported card formats
+CARD_SIZES = {
+    "standard": (63 - 3, 88 - 3),
+    "oversized": (89 - 3, 127 - 3),
+    "planechase": (89 - 3, 127 - 3),
+    "archenemy": (89 - 3, 127 - 3),
+}
+
+
+def plan_pages(cells: Iterable[CellTy], columns: int, rows: int) -> Generator[PageTy, None, None]:
+    """
+    Distribute the cells over pages of `rows` rows of `columns` cells, in reading order.
+    Pages are produced lazily; only the last row of the last page can be incomplete.
+    """
+    return plan_rows(cells, [columns] * rows)
+
+
+def plan_rows(cells: Iterable[CellTy], row_sizes: Sequence[int]) -> Generator[PageTy, None, None]:
+    """
+    Distribute the cells over pages whose rows hold `row_sizes` cells, in reading order.
+    """
+    if not row_sizes or any(n <= 0 for n in row_sizes):
+        raise ValueError("Cards do not fit on the paper")
+    cells = iter(cells)
+    while True:
+        page = []
+        for n in row_sizes:
+            row = list(itertools.islice(cells, n))
+            if not row:
+                break
+            page.append(row)
+        if not page:
+            return
+        yield page
+
+
+class SheetLayout:
+    """
+    Arrangement of the cards on one sheet: the page orientation and, from top to bottom,
+    the number of cards in every row and whether that row holds rotated cards.
+    """
+    def __init__(self, orientation: str, rows: Sequence[Tuple[int, bool]]):
+        self.orientation = orientation
+        self.rows = tuple(rows)
+
+    @property
+    def capacity(self) -> int:
+        return sum(n for n, rotated in self.rows)
+
+    @property
+    def row_sizes(self) -> List[int]:
+        return [n for n, rotated in self.rows]
+
+    @property
+    def mixed(self) -> bool:
+        return any(rotated for n, rotated in self.rows)
+
+    def __eq__(self, other: "SheetLayout") -> bool:
+        return self.orientation == other.orientation and self.rows == other.rows
+
+    def __repr__(self) -> str:
+        return "{0}(orientation={1}, rows={2})".format(type(self).__name__, self.orientation, self.rows)
+
+
+def _fit(length: float, size: float, cut: float) -> int:
+    return max(0, m.floor((length + cut) / (size + cut)))
+
+
+@functools.lru_cache(maxsize=256)
+def best_sheet_layout(width: float, height: float, margins: Tuple[float, float], cut_thickness: float,
+                      card_dimensions: Tuple[float, float], mixed: bool = False) -> SheetLayout:
+    """
+    Layout fitting most cards on a sheet. Without `mixed` all cards are upright and only the
+    page orientation is chosen; with `mixed` rows of rotated cards may fill the space left below
+    the upright rows.
+    """
+    x = width - margins[0] * 2
+    y = height - margins[1] * 2
+    card_width, card_height = card_dimensions
+    cut = cut_thickness
+    best = None
+    for orientation, (usable_width, usable_height) in ((PORTRAIT, (x, y)), (LANDSCAPE, (y, x))):
+        upright_cols = _fit(usable_width, card_width, cut)
+        upright_rows = _fit(usable_height, card_height, cut)
+        candidates = [[(upright_cols, False)] * upright_rows]
+        if mixed:
+            rotated_cols = _fit(usable_width, card_height, cut)
+            for n in range(upright_rows + 1):
+                rest = usable_height - n * (card_height + cut)
+                candidates.append([(upright_cols, False)] * n +
+                                  [(rotated_cols, True)] * _fit(rest, card_width, cut))
+        for rows in candidates:
+            rows = [r for r in rows if r[0] > 0]
+            sheet = SheetLayout(orientation, rows)
+            if best is None or sheet.capacity > best.capacity or \
+                    (sheet.capacity == best.capacity and best.mixed and not sheet.mixed):
+                best = sheet
+    return best
+
+
+def sheets_needed(num_cards: int, sheet: SheetLayout) -> int:
+    if sheet.capacity <= 0:
+        return m.inf
+    return m.ceil(num_cards / sheet.capacity)
+
+
+def stable_cells(previous: Sequence[CellTy], counts: Mapping[CellTy, int]) -> List[CellTy]:
+    """
+    Order the cells (`counts` copies of each) so they stay at the position they had in `previous`.
+    Freed positions are taken by new cells first, then by cells moved from the end,
+    so a small change in the cells only changes few pages.
+    """
+    remaining = Counter({c: n for c, n in counts.items() if n > 0})
+    cells = []  # type: List[Optional[CellTy]]
+    free = []
+    for c in previous:
+        if remaining[c] > 0:
+            cells.append(c)
+            remaining[c] -= 1
+        else:
+            free.append(len(cells))
+            cells.append(None)
+    new = [c for c, n in remaining.items() for _ in range(n)]
+    new.reverse()
+    for pos in free:
+        while cells and cells[-1] is None:
+            cells.pop()
+        if pos >= len(cells):
+            break
+        if new:
+            cells[pos] = new.pop()
+        else:
+            cells[pos] = cells.pop()
+    while cells and cells[-1] is None:
+        cells.pop()
+    new.reverse()
+    cells.extend(new)
+    return cells
@@ -1,57 +1,152 @@
-import math as m
+import itertools
 import os
+import re
 from typing import Dict, Union, Tuple
 import typing
 
-import jinja2
 
 from proxy import paper
+from proxy import pdf
+from proxy import layout
 import mylogger
 logger = mylogger.MAINLOGGER
 
+if typing.TYPE_CHECKING:
+    import jinja2
 
-class OutputLatex:
-    PORTRAIT = "portrait"
-    LANDSCAPE = "landscape"
+_LATEX_ENVIRONMENTS = {}  # type: Dict[str, jinja2.Environment]
 
-    def __init__(self, image_directory: str = "", mypaper: Union[str, paper.Paper] = "a4paper",
-                 card_dimensions: Tuple[float, float] = None, cut_thickness: float = 0,
+
+def get_latex_environment(template_directory: str = None) -> "jinja2.Environment":
+    """
+    Jinja environment with latex friendly delimiters, shared per template directory.
+    Compiled templates are kept in memory by the environment and on disk by its bytecode cache.
+    """
+    if template_directory is None:
+        template_directory = '.'
+    template_directory = os.path.abspath(template_directory)
+    try:
+        return _LATEX_ENVIRONMENTS[template_directory]
+    except KeyError:
+        pass
+    import jinja2
+    env = jinja2.Environment(
+        block_start_string='\BLOCK{',
+        block_end_string='}',
+        variable_start_string='\VAR{',
+        variable_end_string='}',
+        comment_start_string='\#{',
+        comment_end_string='}',
+        line_statement_prefix='%%',
+        line_comment_prefix='%#',
+        trim_blocks=True,
+        autoescape=False,
+        loader=jinja2.FileSystemLoader(template_directory),
+        bytecode_cache=jinja2.FileSystemBytecodeCache()
+    )
+    _LATEX_ENVIRONMENTS[template_directory] = env
+    return env
+
+
+class ProxyOutput:
+    """
+    Paper, layout and image settings shared by all proxy sheet writers.
+    """
+    PORTRAIT = layout.PORTRAIT
+    LANDSCAPE = layout.LANDSCAPE
+    # whether the writer can print rows of rotated cards below the upright ones
+    mixed_rows = True
+
+    def __init__(self, image_directory: str = "",
+                 mypaper: Union[str, paper.Paper, typing.Sequence[Union[str, paper.Paper]]] = "a4paper",
+                 card_dimensions: Union[str, Tuple[float, float]] = None, cut_thickness: float = 0,
                  cut_color: str="black", background_color: str="black", **kwargs):
         self.cut_color = cut_color
         self.cut_thickness = cut_thickness
         self.background_color = background_color
         self.image_directory = image_directory
         if card_dimensions is None:
-            card_dimensions = (63 - 3, 88 - 3)
-        self.card_dimensions = card_dimensions
-        self.latexstr = None
+            card_dimensions = "standard"
+        if isinstance(card_dimensions, str):
+            card_dimensions = layout.CARD_SIZES[card_dimensions]
+        self.card_dimensions = tuple(card_dimensions)
         self.mypaper = None
+        self.paper_candidates = []
         self.cardlayout = None
+        self.sheet = None
         self.paper_orientation = type(self).PORTRAIT
         self.images = None
-        self.load_image_list({})
+        self.cells = None
+        self.shard_signatures = {}
         self.load_paper_settings(mypaper)
+        self.load_image_list({})
         self.extra_settings = kwargs
 
-    def load_paper_settings(self, mypaper):
-        if isinstance(mypaper, str):
-            mypaper = paper.Paper(name=mypaper)
-        self.mypaper = mypaper
-        x = mypaper.width - mypaper.margins[0] * 2
-        y = mypaper.height - mypaper.margins[1] * 2
-        cut_thickness = self.cut_thickness
-        card_dimensions = self.card_dimensions
-        if m.floor((x + cut_thickness) / (card_dimensions[0] + cut_thickness)) * \
-                m.floor((y + cut_thickness) / (card_dimensions[1] + cut_thickness)) >= \
-                        m.floor((x + cut_thickness) / (card_dimensions[1] + cut_thickness)) * \
-                        m.floor((y + cut_thickness) / (card_dimensions[0] + cut_thickness)):
-            self.paper_orientation = type(self).PORTRAIT
-            self.cardlayout = (m.floor((x + cut_thickness) / (card_dimensions[0] + cut_thickness)),
-                               m.floor((y + cut_thickness) / (card_dimensions[1] + cut_thickness)))
-        else:
-            self.paper_orientation = type(self).LANDSCAPE
-            self.cardlayout = (m.floor((y + cut_thickness) / (card_dimensions[0] + cut_thickness)),
-                               m.floor((x + cut_thickness) / (card_dimensions[1] + cut_thickness)))
+    def _sheet_layout(self, mypaper: paper.Paper) -> layout.SheetLayout:
+        return layout.best_sheet_layout(float(mypaper.width), float(mypaper.height),
+                                        tuple(mypaper.margins), self.cut_thickness,
+                                        self.card_dimensions, type(self).mixed_rows)
+
+    def load_paper_settings(self, mypaper, num_cards: int = 0):
+        """
+        Pick the paper (out of one or several candidates) and the layout needing the fewest sheets.
+        """
+        if isinstance(mypaper, (str, paper.Paper)):
+            mypaper = [mypaper]
+        candidates = [paper.Paper(name=p) if isinstance(p, str) else p for p in mypaper]
+        self.paper_candidates = candidates
+        best = min(((p, self._sheet_layout(p)) for p in candidates),
+                   key=lambda t: (layout.sheets_needed(num_cards, t[1]),
+                                  layout.sheets_needed(num_cards, t[1]) * float(t[0].width) * float(t[0].height),
+                                  -t[1].capacity))
+        self.mypaper, self.sheet = best
+        self.paper_orientation = self.sheet.orientation
+        self.cardlayout = (max(self.sheet.row_sizes, default=0), len(self.sheet.rows))
+
+    def load_image_list(self, images: Dict[str, int], previous_cells: typing.Sequence[str] = None):
+        """
+        Store the images as runs of (image path, number of copies).
+        With `previous_cells` (see `cell_paths`) the proxies keep the position they had
+        in that earlier layout where possible.
+        """
+        self.images = [(os.path.join(self.image_directory, img), num)
+                       for img, num in images.items() if num > 0]
+        if len(self.paper_candidates) > 1:
+            self.load_paper_settings(self.paper_candidates, sum(num for img, num in self.images))
+        self.cells = None
+        if previous_cells is not None:
+            index = {img: i for i, (img, num) in enumerate(self.images)}
+            self.cells = [index[img] for img in
+                          layout.stable_cells(previous_cells, {img: num for img, num in self.images})]
+
+    def image_indices(self) -> typing.Iterator[int]:
+        """
+        Index of the (distinct) image for every proxy, in printing order.
+        """
+        if self.cells is not None:
+            yield from self.cells
+            return
+        for i, (img, num) in enumerate(self.images):
+            for _ in range(num):
+                yield i
+
+    def cell_paths(self) -> typing.List[str]:
+        return [self.images[i][0] for i in self.image_indices()]
+
+    def pages(self) -> typing.Iterator[layout.PageTy]:
+        """
+        Layout plan: image indices per row per page.
+        """
+        return layout.plan_rows(self.image_indices(), self.sheet.row_sizes)
+
+
+class OutputLatex(ProxyOutput):
+    # the template lays out every page as one grid
+    mixed_rows = False
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latexstr = None
 
     def save(self, target: typing.io.TextIO, latexstr: str = None):
         logger.info("Saving latex ({0})...".format(target))
@@ -62,56 +157,206 @@ class OutputLatex:
         target.write(latexstr)
         logger.info("Saving latex, done!")
 
-    def load_image_list(self, images: Dict[str, int]):
-        image_list = []
-        for img, num in images.items():
-            image_list.extend([os.path.join(self.image_directory, img)] * num)
-        self.images = image_list
-
     def create_latex(self, template_name):
         self.latexstr = self._create_latex(template_name)
 
     def _create_latex(self, template_name: str, **kwargs) -> str:
+        lastr = "".join(self._generate_latex(template_name, **kwargs))
+        logger.info("Writing latex: done!")
+        return lastr
+
+    def _paper_string(self) -> str:
+        namestr = self.mypaper.name
+        if namestr is None:
+            namestr = "paperwidth={0}mm,paperheight={1}mm".format(self.mypaper.width, self.mypaper.height)
+        return namestr
+
+    def _generate_latex(self, template_name: str, pages: typing.Iterable[layout.PageTy] = None,
+                        image_files: typing.Sequence[str] = None, **kwargs) -> typing.Iterator[str]:
         print("Creating latex ({0})...".format(template_name))
-        latex_jinja_env = jinja2.Environment(
-            block_start_string='\BLOCK{',
-            block_end_string='}',
-            variable_start_string='\VAR{',
-            variable_end_string='}',
-            comment_start_string='\#{',
-            comment_end_string='}',
-            line_statement_prefix='%%',
-            line_comment_prefix='%#',
-            trim_blocks=True,
-            autoescape=False,
-            loader=jinja2.FileSystemLoader(os.path.abspath('.'))
-        )
+        latex_jinja_env = get_latex_environment()
         mypaper = self.mypaper
         cardlayout = self.cardlayout
         card_dimensions = self.card_dimensions
-        image_list = self.images
         template = latex_jinja_env.get_template(template_name)
-        namestr = mypaper.name
-        if namestr is None:
-            namestr = "paperwidth={0}mm,paperheight={1}mm".format(mypaper.width, mypaper.height)
-
-        lastr = template.render(paper=namestr,
-                                orientation=self.paper_orientation,
-                                hmargin=mypaper.margins[0],
-                                vmargin=mypaper.margins[1],
-                                num_img_hor=cardlayout[0],
-                                num_img_ver=cardlayout[1],
-                                images=[os.path.splitext(img)[0].replace('\\', '/') for img in image_list],
-                                img_width=card_dimensions[0],
-                                img_height=card_dimensions[1],
-                                cut_thickness=self.cut_thickness,
-                                cut_color=self.cut_color,
-                                background_color=self.background_color,
-                                **{**self.extra_settings, **kwargs})
-        logger.info("Writing latex: done!")
-        return lastr
+        if pages is None:
+            pages = self.pages()
+        if image_files is None:
+            image_files = [img for img, num in self.images]
+
+        return template.generate(paper=self._paper_string(),
+                                 orientation=self.paper_orientation,
+                                 hmargin=mypaper.margins[0],
+                                 vmargin=mypaper.margins[1],
+                                 num_img_hor=cardlayout[0],
+                                 num_img_ver=cardlayout[1],
+                                 image_files=[os.path.splitext(img)[0].replace('\\', '/')
+                                              for img in image_files],
+                                 pages=pages,
+                                 img_width=card_dimensions[0],
+                                 img_height=card_dimensions[1],
+                                 cut_thickness=self.cut_thickness,
+                                 cut_color=self.cut_color,
+                                 background_color=self.background_color,
+                                 **{**self.extra_settings, **kwargs})
+
+    def stream(self, target: typing.io.TextIO, template_name: str, **kwargs):
+        """
+        Render the latex straight into `target`, chunk by chunk.
+        """
+        logger.info("Saving latex ({0})...".format(target))
+        for chunk in self._generate_latex(template_name, **kwargs):
+            target.write(chunk)
+        logger.info("Saving latex, done!")
 
     def __call__(self, fileobj: typing.io.TextIO, template_name: str, *args, **kwargs):
-        latexstr = self._create_latex(template_name)
-        self.save(fileobj, latexstr)
+        self.stream(fileobj, template_name)
+
+    def _shards(self, shard_pages: int) \
+            -> typing.Iterator[typing.Tuple[typing.List[layout.PageTy], typing.List[str]]]:
+        """
+        Split the layout plan in shards of `shard_pages` pages.
+        Every shard only refers to its own images, renumbered from 0.
+        """
+        pages = self.pages()
+        while True:
+            shard = list(itertools.islice(pages, shard_pages))
+            if not shard:
+                return
+            used = sorted({img for page in shard for row in page for img in row})
+            renumber = {img: n for n, img in enumerate(used)}
+            shard = [[[renumber[img] for img in row] for row in page] for page in shard]
+            yield shard, [self.images[img][0] for img in used]
+
+    def write_shards(self, fname: str, template_name: str, shard_pages: int,
+                     master_template_name: str = "shard_master.tex",
+                     previous_signatures: Dict[str, typing.Any] = None) -> typing.List[str]:
+        """
+        Write the proxies as independent latex documents of `shard_pages` pages each
+        (<name>-001.tex, ...) and a master document `fname` that joins the compiled shards.
+        Shards whose content did not change are not rewritten, so they keep their timestamp.
+        Shards whose signature (image paths per row per page) equals the one in `previous_signatures`
+        are not even rendered; the new signatures are kept in `shard_signatures`.
+        Shards left by an earlier build with more shards are deleted.
+        """
+        if shard_pages <= 0:
+            raise ValueError("Shards need at least one page")
+        if previous_signatures is None:
+            previous_signatures = {}
+        base, ext = os.path.splitext(fname)
+        shard_names = []
+        self.shard_signatures = {}
+        for n, (pages, image_files) in enumerate(self._shards(shard_pages), 1):
+            shard_name = "{0}-{1:03d}{2}".format(base, n, ext)
+            key = os.path.basename(shard_name)
+            signature = [[[image_files[img] for img in row] for row in page] for page in pages]
+            self.shard_signatures[key] = signature
+            shard_names.append(shard_name)
+            if previous_signatures.get(key) == signature and os.path.isfile(shard_name):
+                continue
+            latexstr = "".join(self._generate_latex(template_name, pages=pages, image_files=image_files))
+            if _write_if_changed(shard_name, latexstr):
+                logger.info(verbose_msg="Shard written: %s", verbose_args=(shard_name,))
+        template = get_latex_environment().get_template(master_template_name)
+        master = template.render(paper=self._paper_string(),
+                                 orientation=self.paper_orientation,
+                                 shards=[os.path.splitext(os.path.basename(s))[0] for s in shard_names])
+        _write_if_changed(fname, master)
+        for stale in _stale_shards(base, ext, len(shard_names)):
+            os.remove(stale)
+            logger.info(verbose_msg="Stale shard removed: %s", verbose_args=(stale,))
+        logger.info("Writing latex shards: done! ({0} shards)".format(len(shard_names)))
+        return shard_names
+
+
+def _stale_shards(base: str, ext: str, count: int) -> typing.List[str]:
+    """
+    Shards <base>-NNN<ext> numbered beyond `count`.
+    """
+    prog = re.compile(re.escape(os.path.basename(base)) + r"-(\d{3,})" + re.escape(ext))
+    stale = []
+    for f in os.listdir(os.path.dirname(base) or "."):
+        m = prog.fullmatch(f)
+        if m is not None and int(m.group(1)) > count:
+            stale.append(os.path.join(os.path.dirname(base), f))
+    return sorted(stale)
+
+
+def _write_if_changed(fname: str, text: str) -> bool:
+    try:
+        with open(fname) as f:
+            if f.read() == text:
+                return False
+    except OSError:
+        pass
+    with open(fname, "w") as f:
+        f.write(text)
+    return True
+
+
+class OutputPDF(ProxyOutput):
+    """
+    Writes the proxy sheets directly as pdf, every distinct image is embedded once.
+    Relative image paths are taken relative to the directory of the output file.
+    """
+    def _page_size(self) -> Tuple[float, float]:
+        if self.paper_orientation == type(self).LANDSCAPE:
+            return float(self.mypaper.height), float(self.mypaper.width)
+        return float(self.mypaper.width), float(self.mypaper.height)
+
+    def _image_path(self, img: str, base_directory: str) -> str:
+        if os.path.isabs(img):
+            return img
+        return os.path.join(base_directory, img)
+
+    def _draw_page(self, content: pdf.PageContent, page: layout.PageTy,
+                   page_width: float, page_height: float):
+        card_width, card_height = self.card_dimensions
+        cut = self.cut_thickness
+        background = pdf.get_color(self.background_color)
+        cut_color = pdf.get_color(self.cut_color) if cut > 0 else None
+        row_shapes = []
+        for capacity, rotated in self.sheet.rows:
+            width, height = (card_height, card_width) if rotated else (card_width, card_height)
+            row_shapes.append((capacity, rotated, width, height))
+        sheet_height = sum(shape[3] for shape in row_shapes) + (len(row_shapes) - 1) * cut
+        sheet_width = max(shape[0] * shape[2] + (shape[0] - 1) * cut for shape in row_shapes)
+        y = (page_height - sheet_height) / 2
+        for r, row in enumerate(page):
+            capacity, rotated, width, height = row_shapes[r]
+            left = (page_width - (capacity * width + (capacity - 1) * cut)) / 2
+            for c, img in enumerate(row):
+                x = left + c * (width + cut)
+                content.fill_rect(x, y, width, height, background)
+                content.draw_image("Im{0}".format(img), x, y, width, height, rotated)
+                if cut_color is not None and c > 0:
+                    content.fill_rect(x - cut, y, cut, height, cut_color)
+            if cut_color is not None and r > 0:
+                content.fill_rect((page_width - sheet_width) / 2, y - cut, sheet_width, cut, cut_color)
+            y += height + cut
+
+    def __call__(self, fileobj: typing.BinaryIO, *args, **kwargs):
+        logger.info("Saving pdf ({0})...".format(getattr(fileobj, "name", fileobj)))
+        base_directory = os.path.dirname(os.path.abspath(getattr(fileobj, "name", ".")))
+        writer = pdf.PDFWriter(fileobj)
+        catalog = writer.reserve()
+        pages = writer.reserve()
+        images = [writer.add_jpeg(self._image_path(img, base_directory)) for img, num in self.images]
+        resources = writer.add_object("<< /XObject << {0} >> >>".format(
+            " ".join("/Im{0} {1} 0 R".format(i, num) for i, num in enumerate(images))))
 
+        page_width, page_height = self._page_size()
+        kids = []
+        for page in self.pages():
+            content = pdf.PageContent(page_height)
+            self._draw_page(content, page, page_width, page_height)
+            contents = writer.add_stream(content.to_bytes())
+            kids.append(writer.add_object(
+                "<< /Type /Page /Parent {0} 0 R /MediaBox [0 0 {1} {2}] /Resources {3} 0 R /Contents {4} 0 R >>"
+                .format(pages, pdf.format_number(page_width * pdf.MM_TO_PT),
+                        pdf.format_number(page_height * pdf.MM_TO_PT), resources, contents)))
+        writer.add_object("<< /Type /Pages /Kids [{0}] /Count {1} >>".format(
+            " ".join("{0} 0 R".format(k) for k in kids), len(kids)), pages)
+        writer.add_object("<< /Type /Catalog /Pages {0} 0 R >>".format(pages), catalog)
+        writer.close(catalog)
+        logger.info("Saving pdf, done!")
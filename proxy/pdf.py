@@ -0,0 +1,170 @@
+import shutil
+from typing import Dict, List, Tuple, BinaryIO
+
+MM_TO_PT = 72 / 25.4
+
+# rgb values of the xcolor base colours
+COLORS = {
+    "black": (0, 0, 0),
+    "white": (1, 1, 1),
+    "gray": (0.5, 0.5, 0.5),
+    "darkgray": (0.25, 0.25, 0.25),
+    "lightgray": (0.75, 0.75, 0.75),
+    "red": (1, 0, 0),
+    "green": (0, 1, 0),
+    "blue": (0, 0, 1),
+    "cyan": (0, 1, 1),
+    "magenta": (1, 0, 1),
+    "yellow": (1, 1, 0),
+    "brown": (0.75, 0.5, 0.25),
+    "lime": (0.75, 1, 0),
+    "olive": (0.5, 0.5, 0),
+    "orange": (1, 0.5, 0),
+    "pink": (1, 0.75, 0.75),
+    "purple": (0.75, 0, 0.25),
+    "teal": (0, 0.5, 0.5),
+    "violet": (0.5, 0, 0.5),
+}
+
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+_COLOR_SPACES = {1: "/DeviceGray", 3: "/DeviceRGB", 4: "/DeviceCMYK"}
+
+
+def get_color(name: str) -> Tuple[float, float, float]:
+    try:
+        return COLORS[name.lower()]
+    except KeyError:
+        raise ValueError("Unknown colour '{0}'".format(name))
+
+
+def jpeg_info(fname: str) -> Tuple[int, int, int]:
+    """
+    Width, height and number of colour components of a jpeg file, read from its frame header.
+    """
+    with open(fname, "rb") as f:
+        if f.read(2) != b"\xff\xd8":
+            raise ValueError("{0} is not a jpeg file".format(fname))
+        while True:
+            b = f.read(1)
+            if not b:
+                break
+            if b != b"\xff":
+                continue
+            marker = f.read(1)
+            while marker == b"\xff":
+                marker = f.read(1)
+            if not marker:
+                break
+            marker = marker[0]
+            if marker == 0xD8 or 0xD0 <= marker <= 0xD7 or marker == 0x01:
+                continue
+            length = int.from_bytes(f.read(2), "big")
+            if marker in _SOF_MARKERS:
+                data = f.read(length - 2)
+                height = int.from_bytes(data[1:3], "big")
+                width = int.from_bytes(data[3:5], "big")
+                return width, height, data[5]
+            f.seek(length - 2, 1)
+    raise ValueError("{0}: no jpeg frame header found".format(fname))
+
+
+def format_number(n: float) -> str:
+    return "{0:.3f}".format(n).rstrip("0").rstrip(".")
+
+
+class PDFWriter:
+    """
+    Minimal pdf writer: objects are written to the binary stream as soon as they are added,
+    only their offsets are kept for the cross reference table.
+    """
+    def __init__(self, target: BinaryIO):
+        self.target = target
+        self.offsets = {}  # type: Dict[int, int]
+        self.position = 0
+        self.object_count = 0
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _write(self, data: bytes):
+        self.target.write(data)
+        self.position += len(data)
+
+    def reserve(self) -> int:
+        self.object_count += 1
+        return self.object_count
+
+    def add_object(self, content: str, num: int = None) -> int:
+        if num is None:
+            num = self.reserve()
+        self.offsets[num] = self.position
+        self._write("{0} 0 obj\n{1}\nendobj\n".format(num, content).encode("latin-1"))
+        return num
+
+    def add_stream(self, data: bytes, dictionary: str = "", num: int = None) -> int:
+        if num is None:
+            num = self.reserve()
+        self.offsets[num] = self.position
+        self._write("{0} 0 obj\n<< {1} /Length {2} >>\nstream\n".format(num, dictionary, len(data))
+                    .encode("latin-1"))
+        self._write(data)
+        self._write(b"\nendstream\nendobj\n")
+        return num
+
+    def add_jpeg(self, fname: str) -> int:
+        width, height, components = jpeg_info(fname)
+        try:
+            colorspace = _COLOR_SPACES[components]
+        except KeyError:
+            raise ValueError("{0}: unsupported number of colour components".format(fname))
+        with open(fname, "rb") as f:
+            f.seek(0, 2)
+            length = f.tell()
+            f.seek(0)
+            num = self.reserve()
+            self.offsets[num] = self.position
+            self._write("{0} 0 obj\n<< /Type /XObject /Subtype /Image /Width {1} /Height {2} "
+                        "/ColorSpace {3} /BitsPerComponent 8 /Filter /DCTDecode /Length {4} >>\nstream\n"
+                        .format(num, width, height, colorspace, length).encode("latin-1"))
+            shutil.copyfileobj(f, self.target)
+            self.position += length
+        self._write(b"\nendstream\nendobj\n")
+        return num
+
+    def close(self, root: int):
+        xref = self.position
+        lines = ["xref", "0 {0}".format(self.object_count + 1), "0000000000 65535 f "]
+        lines.extend("{0:010d} 00000 n ".format(self.offsets[i]) for i in range(1, self.object_count + 1))
+        lines.append("trailer\n<< /Size {0} /Root {1} 0 R >>".format(self.object_count + 1, root))
+        lines.append("startxref\n{0}\n%%EOF\n".format(xref))
+        self._write("\n".join(lines).encode("latin-1"))
+
+
+class PageContent:
+    """
+    Content stream of a single page, coordinates in mm from the top left corner.
+    """
+    def __init__(self, page_height: float):
+        self.page_height = page_height
+        self.operations = []  # type: List[str]
+
+    def _rect(self, x: float, y: float, width: float, height: float) -> str:
+        return " ".join(format_number(v * MM_TO_PT)
+                        for v in (x, self.page_height - y - height, width, height))
+
+    def fill_rect(self, x: float, y: float, width: float, height: float, color: Tuple[float, float, float]):
+        self.operations.append("{0} rg {1} re f".format(" ".join(map(format_number, color)),
+                                                       self._rect(x, y, width, height)))
+
+    def draw_image(self, name: str, x: float, y: float, width: float, height: float, rotated: bool = False):
+        """
+        Draw an image in the given box; a rotated image is turned a quarter counterclockwise.
+        """
+        bottom = self.page_height - y - height
+        if rotated:
+            matrix = (0, height, -width, 0, x + width, bottom)
+        else:
+            matrix = (width, 0, 0, height, x, bottom)
+        self.operations.append("q {0} cm /{1} Do Q".format(
+            " ".join(format_number(v * MM_TO_PT) for v in matrix), name))
+
+    def to_bytes(self) -> bytes:
+        return "\n".join(self.operations).encode("latin-1")
@@ -28,6 +28,9 @@ CardListTy = Sequence[CardCountTy]
 ReadLineFuncTy = Callable[[str, Optional[Sequence[Any]], Optional[Mapping[str, Any]]],
                           Optional[CardCountSecTy]]
 ReadFuncTy = Callable[[typing.io.TextIO], Tuple[CardListTy, CardListTy]]
+CardSecIterTy = Iterable[CardCountSecTy]
+IterFuncTy = Callable[[typing.io.TextIO], CardSecIterTy]
 
 SaveFuncTy = Callable[[typing.io.TextIO, CardListTy, CardListTy], None]
+WriteLineFuncTy = Callable[[Card, int, bool], str]
 
@@ -0,0 +1,72 @@
+import contextlib
+import json
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, AnyStr, Dict, List
+
+
+class RunReport:
+    """
+    Wall and cpu time spent in every stage of a run, and counters of what was done.
+    Stages may be entered several times and from several threads, their times add up.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started = time.time()
+            self._start = time.perf_counter()
+            self.stages = OrderedDict()  # type: Dict[str, List[float]]
+            self.counts = Counter()
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.thread_time() - cpu
+            with self.lock:
+                timing = self.stages.setdefault(name, [0.0, 0.0, 0])
+                timing[0] += wall
+                timing[1] += cpu
+                timing[2] += 1
+
+    def count(self, name: str, n: int = 1):
+        with self.lock:
+            self.counts[name] += n
+
+    def to_json(self) -> Dict[str, Any]:
+        with self.lock:
+            return {"started": self.started,
+                    "elapsed": time.perf_counter() - self._start,
+                    "stages": OrderedDict((name, {"wall": wall, "cpu": cpu, "calls": calls})
+                                          for name, (wall, cpu, calls) in self.stages.items()),
+                    "counts": dict(self.counts)}
+
+    def summary(self) -> str:
+        d = self.to_json()
+        lines = ["{0:<20} {1:>9} {2:>9} {3:>7}".format("stage", "wall (s)", "cpu (s)", "calls")]
+        lines.extend("{0:<20} {1:>9.3f} {2:>9.3f} {3:>7}".format(name, t["wall"], t["cpu"], t["calls"])
+                     for name, t in d["stages"].items())
+        lines.append("{0:<20} {1:>9.3f}".format("total", d["elapsed"]))
+        lines.extend("{0:<20} {1:>9}".format(name, n) for name, n in sorted(d["counts"].items()))
+        return "\n".join(lines)
+
+    def save(self, fname: AnyStr):
+        with open(fname, "w") as f:
+            json.dump(self.to_json(), f, indent=2)
+
+
+REPORT = RunReport()
+
+
+def stage(name: str):
+    return REPORT.stage(name)
+
+
+def count(name: str, n: int = 1):
+    REPORT.count(name, n)
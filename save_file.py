@@ -1,30 +1,30 @@
-import io
 import itertools
 import typing
 import os
+from concurrent.futures import ThreadPoolExecutor
 from typing import Iterable
-from typing import Optional, Callable, List, Tuple, Dict
-import requests
+from typing import Optional, Dict
 
 import card
 from card import Card
-from proxybuilder_types import CardListTy, CardIterTy
+from proxybuilder_types import CardListTy, CardIterTy, CardSecIterTy, SaveFuncTy, WriteLineFuncTy
 import card_downloader as cdl
-from export.jsonencoders import dump_string, dump_file
+from export.jsonencoders import dump_file
 import mylogger
 
 logger = mylogger.MAINLOGGER
 
 
 def save_file(outstream: typing.TextIO, mainboard: CardIterTy, sideboard: CardIterTy,
-              card_process: Callable[[Card, int, bool], str]):
+              card_process: WriteLineFuncTy):
     mainboard = ((c, num, True) for c, num in mainboard)
     sideboard = ((c, num, False) for c, num in sideboard)
-    longlist = itertools.chain(mainboard, sideboard)
-    longlist = list(longlist)
-    for c, count, sec in longlist:
-        line = card_process(c, count, sec)
-        outstream.write(line)
+    write_rows(outstream, itertools.chain(mainboard, sideboard), card_process)
+
+
+def write_rows(outstream: typing.TextIO, rows: CardSecIterTy, card_process: WriteLineFuncTy):
+    for c, count, sec in rows:
+        outstream.write(card_process(c, count, sec))
 
 
 class WriteHandleTextLine:
@@ -65,36 +65,43 @@ class WriteHandleXMageLine:
     }
     unsupported_cards = {}
 
-    def __init__(self, name: str = None, session: cdl.CardDownloader = None):
+    def __init__(self, name: str = None, session: cdl.CardDownloader = None,
+                 resolved: Dict[Card, Card] = None):
         self.name = name
         self.first_line = False
 
         if session is None:
-            session = cdl.CardDownloader()
+            session = cdl.get_shared_downloader()
         self.session = session
+        if resolved is None:
+            resolved = {}
+        self.resolved = resolved
+
+    @classmethod
+    def find_supported_version(cls, c: Card, session: cdl.CardDownloader) -> Card:
+        analyzer = session.load_card_record(c.name, c.edition, next(c.magiccards_info_number_list(), None), c.language)
+        try:
+            ed, lan, n, is_double = next((ed, lan, n, is_double)
+                                         for ed, lan, n, is_double in analyzer.get_all_editions()
+                                         if ed not in cls.unsupported_sets)
+        except StopIteration:
+            logger.error("Set unsupported, card: {0} - no working version".format(c))
+            raise
+        new_card = Card(c.name, ed, n, lan, is_double)
+        logger.warning("Set unsupported, card: %s", verbose_msg="New card: %s",
+                       msg_args=(c,), verbose_args=(new_card,))
+        return new_card
 
     def __call__(self, c: Card, count: int, section: bool) -> str:
         line = ""
-        analyzer = None
         if not self.first_line:
             line += "NAME:{0}\n".format(self.name)
             self.first_line = True
         if not section:
             line += "SB: "
-        if c.edition.lower() in self.unsupported_sets:
-            if analyzer is None:
-                analyzer = self.session.make_html_analyzer(c.name, c.edition, next(c.magiccards_info_number_list()), c.language)
-            try:
-                ed, lan, n, is_double = next((ed, lan, n, is_double)
-                                             for ed, lan, n, is_double in analyzer.get_all_editions()
-                                             if ed not in self.unsupported_sets)
-                old_card = c
-                c = Card(old_card.name, ed, n, lan, is_double)
-                logger.warning("Set unsupported, card: {0}".format(old_card),
-                               verbose_msg="New card: {0}".format(c))
-            except StopIteration:
-                logger.error("Set unsupported, card: {0} - no working version".format(old_card))
-                raise
+        if c not in self.resolved and _needs_xmage_resolution(c):
+            self.resolved[c] = _resolve_xmage_card(c, self.session)
+        c = self.resolved.get(c, c)
         line += "{0} [{1}:{2}] {3}\n".format(count, c.edition.upper(), c.collectors_number, c.name)
         return line
 
@@ -106,16 +113,68 @@ def _check_and_force_edition_num(c: Card, session: cdl.CardDownloader = None):
         return card.force_edition_and_number_copy(c, session)
 
 
-def save_xmage(outstream: typing.TextIO, mainboard: CardListTy, sideboard: CardListTy, name: str = None) -> None:
-    session = cdl.CardDownloader()
-    newmainboard = ((_check_and_force_edition_num(c, session), n) for c, n in mainboard)
-    newsideboard = ((_check_and_force_edition_num(c, session), n) for c, n in sideboard)
+def _needs_xmage_resolution(c: Card) -> bool:
+    return not (c.name and c.collectors_number and c.edition) or \
+        c.edition.lower() in WriteHandleXMageLine.unsupported_sets
+
+
+def _resolve_xmage_card(c: Card, session: cdl.CardDownloader) -> Card:
+    c = _check_and_force_edition_num(c, session)
+    if c.edition.lower() in WriteHandleXMageLine.unsupported_sets:
+        c = WriteHandleXMageLine.find_supported_version(c, session)
+    return c
+
+
+def resolve_xmage_cards(cards: Iterable[Card], session: cdl.CardDownloader = None,
+                        max_workers: int = 8) -> Dict[Card, Card]:
+    """
+    Look up all cards that can not be written to an xmage file as is.
+    Every distinct card is resolved once, the lookups run concurrently.
+    """
+    todo = list({c for c in cards if _needs_xmage_resolution(c)})
+    if not todo:
+        return {}
+    if session is None:
+        session = cdl.get_shared_downloader()
+    logger.info("Resolving {0} cards...".format(len(todo)))
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        resolved = dict(zip(todo, pool.map(lambda c: _resolve_xmage_card(c, session), todo)))
+    logger.info("Resolving cards, done!")
+    return resolved
+
+
+def save_xmage(outstream: typing.TextIO, mainboard: CardListTy, sideboard: CardListTy, name: str = None,
+               session: cdl.CardDownloader = None) -> None:
+    if session is None:
+        session = cdl.get_shared_downloader()
+    mainboard = list(mainboard)
+    sideboard = list(sideboard)
+    resolved = resolve_xmage_cards(itertools.chain((c for c, n in mainboard), (c for c, n in sideboard)),
+                                   session)
     if not name:
         name = os.path.splitext(os.path.split(outstream.name)[-1])[0]
-    card_processor = WriteHandleXMageLine(name)
-    save_file(outstream, newmainboard, newsideboard, card_processor)
+    card_processor = WriteHandleXMageLine(name, session, resolved)
+    save_file(outstream, mainboard, sideboard, card_processor)
 
 
-def save_json(outstream: typing.TextIO, mainboard: CardIterTy, sideboard: CardListTy, name: str = None) -> None:
+def save_json(outstream: typing.TextIO, mainboard: CardIterTy, sideboard: CardListTy, name: str = None,
+              compact: bool = False) -> None:
     d = {"mainboard": [(c, n) for c, n in mainboard], "sideboard": [(c, n) for c, n in sideboard], "name": name}
-    dump_file(d, outstream)
+    dump_file(d, outstream, compact=compact)
+
+
+def save_compact_json(outstream: typing.TextIO, mainboard: CardIterTy, sideboard: CardListTy,
+                      name: str = None) -> None:
+    save_json(outstream, mainboard, sideboard, name, compact=True)
+
+
+def find_line_processor(saver: SaveFuncTy, name: str = None,
+                        session: cdl.CardDownloader = None) -> Optional[WriteLineFuncTy]:
+    """
+    Line writer of a line oriented output format, None if `saver` needs the whole deck.
+    """
+    if saver is save_txt:
+        return WriteHandleTextLine()
+    if saver is save_xmage:
+        return WriteHandleXMageLine(name, session)
+    return None
@@ -0,0 +1,20 @@
+import pytest
+
+from benchmarks import run
+
+
+@pytest.mark.parametrize("bench", run.BENCHMARKS, ids=lambda b: b.name)
+def test_benchmark_runs(bench, monkeypatch):
+    monkeypatch.chdir(run.ROOT)
+    func, items = bench.setup(10)
+    func()
+    assert items > 0
+
+
+def test_compare():
+    before = {"results": {"read_txt": {"100": {"seconds": 2.0}}}}
+    after = {"results": {"read_txt": {"100": {"seconds": 1.0}}, "new": {"100": {"seconds": 1.0}}}}
+    lines = run.compare(before, after).splitlines()
+    assert len(lines) == 2
+    assert lines[1].split()[:2] == ["read_txt", "100"]
+    assert lines[1].endswith("2.00x")
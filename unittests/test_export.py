@@ -0,0 +1,61 @@
+import logging
+
+import pytest
+
+import mylogger
+from UI_Handler import export_main
+from UI_Handler import main
+
+
+@pytest.fixture
+def decks(tmpdir):
+    tmpdir.mkdir("decks")
+    tmpdir.join("decks", "burn.txt").write("4 Lightning Bolt\n")
+    tmpdir.join("decks", "elves.txt").write("4 Llanowar Elves\n")
+    tmpdir.join("decks", "notes.md").write("4 Island\n")
+    return tmpdir
+
+
+def test_export_directory(decks):
+    main.main(["export", str(decks.join("decks")), str(decks.join("out")), "--outtype", "json"])
+    assert sorted(f.basename for f in decks.join("out").listdir()) == ["burn.json", "elves.json", "notes.json"]
+    assert "lightning bolt" in decks.join("out", "burn.json").read()
+
+
+def test_export_glob(decks):
+    main.main(["export", str(decks.join("decks", "*.txt")), str(decks.join("out")), "--outtype", "txt", "-j", "2"])
+    assert sorted(f.basename for f in decks.join("out").listdir()) == ["burn.txt", "elves.txt"]
+    assert "llanowar elves" in decks.join("out", "elves.txt").read()
+
+
+def test_failures_reported(decks, caplog):
+    decks.join("decks", "broken.json").write("{not json")
+    with caplog.at_level(logging.ERROR):
+        main.main(["export", str(decks.join("decks")), str(decks.join("out")), "--outtype", "txt"])
+    assert "1 of 4 files failed" in caplog.text
+    assert "broken.json" in caplog.text
+    assert decks.join("out", "burn.txt").check()
+
+
+def test_output_collisions(decks, caplog):
+    decks.join("decks", "burn.csv").write("Count,Name\n4,Shock\n")
+    with caplog.at_level(logging.ERROR):
+        main.main(["export", str(decks.join("decks")), str(decks.join("out")), "--outtype", "txt"])
+    assert "2 of 4 files failed" in caplog.text
+    assert not decks.join("out", "burn.txt").check()
+    assert decks.join("out", "elves.txt").check()
+
+
+def test_split_output_collisions():
+    jobs = [("a.txt", "out/a.json"), ("b.txt", "out/b.json"), ("a.csv", "out/a.json")]
+    unique, collisions = export_main.split_output_collisions(jobs)
+    assert unique == [("b.txt", "out/b.json")]
+    assert [i for i, e in collisions] == ["a.txt", "a.csv"]
+    assert "a.csv" in str(collisions[0][1])
+
+
+def test_stream_restores_log_stream(decks, capsys):
+    stream = mylogger.logging_handler_out.stream
+    main.main(["export", str(decks.join("decks", "burn.txt")), "-", "--outtype", "txt"])
+    assert "lightning bolt" in capsys.readouterr().out
+    assert mylogger.logging_handler_out.stream is stream
@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+import deck
+import load_file
+from benchmarks import generate
+
+READERS = {"txt": load_file.read_txt, "xmage": load_file.read_xmage_deck, "json": load_file.read_json}
+
+
+def _read_all(directory):
+    out = {}
+    for root, dirs, files in os.walk(directory):
+        for fname in files:
+            path = os.path.join(root, fname)
+            with open(path) as f:
+                out[os.path.relpath(path, directory)] = f.read()
+    return out
+
+
+def test_same_seed_same_files(tmpdir):
+    generate.generate(str(tmpdir.join("a")), cards=200, decks=3, seed=5)
+    generate.generate(str(tmpdir.join("b")), cards=200, decks=3, seed=5)
+    generate.generate(str(tmpdir.join("c")), cards=200, decks=3, seed=6)
+    a, b, c = (_read_all(str(tmpdir.join(d))) for d in "abc")
+    assert a == b
+    assert a != c
+    assert sorted(a) == ["alldecks/deck_0001.txt", "alldecks/deck_0002.txt", "deck.txt", "inventory.csv"]
+
+
+@pytest.mark.parametrize("fmt", ["xmage", "json"])
+def test_decks_read_back(tmpdir, fmt):
+    paths = generate.generate(str(tmpdir), cards=200, decks=2, deck_size=40, sideboard=10, fmt=fmt)
+    dck = deck.Deck()
+    with open(paths["deck"]) as f:
+        dck.load(f, READERS[fmt])
+    assert dck.number_cards_main() == 40
+    assert dck.number_cards_side() == 10
+    assert all(c.edition and c.collectors_number for c in dck.full_deck)
+
+
+def test_inventory_read_back(tmpdir):
+    collection = generate.SyntheticCollection(100, duplicates=0.5)
+    rows = collection.inventory_rows()
+    fname = str(tmpdir.join("inventory.csv"))
+    generate.write_inventory(fname, rows)
+    with open(fname) as f:
+        inventory = load_file.read_inventory_deckbox_org(f)
+    assert len(rows) > 105
+    assert sum(n for c, n in inventory) == sum(r[0] for r in rows)
@@ -0,0 +1,65 @@
+import io
+
+import pytest
+
+import card
+import deck
+import load_file
+import save_file
+from export import jsonencoders
+
+
+def make_test_deck():
+    dck = deck.Deck()
+    dck.add_main(card.Card("a", "lea", 1, "en"), 4)
+    dck.add_main(card.Card("b"), 2)
+    dck.add_main(card.Card("c", "m10", language="de"), 1)
+    dck.add_side(card.Card("d", "2ed", 12), 3)
+    return dck
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_roundtrip_string(compact):
+    c = card.Card("a", "lea", 1, "en")
+    c.mana = "2GG"
+    s = jsonencoders.dump_string([c], compact=compact)
+    loaded = jsonencoders.load_string(s)[0]
+    assert loaded == c
+    assert loaded.mana_string() == c.mana_string()
+
+
+def test_compact_is_smaller():
+    dck = make_test_deck()
+    assert len(jsonencoders.dump_string(list(dck.mainboard.items()), compact=True).encode()) < \
+        len(jsonencoders.dump_string(list(dck.mainboard.items())).encode())
+
+
+@pytest.mark.parametrize("saver", [save_file.save_json, save_file.save_compact_json])
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 16])
+def test_read_json_streaming(saver, chunk_size, monkeypatch):
+    dck = make_test_deck()
+    f = io.StringIO()
+    dck.save(f, saver)
+    f.seek(0)
+
+    def small_chunks(fp, chunk_size_=chunk_size, load=jsonencoders.iter_load_file):
+        return load(fp, chunk_size=chunk_size_)
+    monkeypatch.setattr(load_file, "iter_load_file", small_chunks)
+    loaded = deck.Deck()
+    loaded.load(f, load_file.read_json)
+    assert loaded == dck
+
+
+def test_iter_load_file_members():
+    f = io.StringIO('{"a": [1, 22, {"x": 3}], "b": 456, "c": [], "d": "text"}')
+    assert list(jsonencoders.iter_load_file(f, chunk_size=2)) == \
+        [("a", 1), ("a", 22), ("a", {"x": 3}), ("b", 456), ("d", "text")]
+
+
+def test_registry_decoding_does_not_mutate():
+    o = {"class": "Card", "module": "card", "name": "a", "edition": None, "language": None,
+         "collectors_number": None, "_supertypes": [], "_types": [], "_subtypes": [],
+         "mana": "", "pt": None}
+    c = jsonencoders.json_decoder(o)
+    assert c == card.Card("a")
+    assert "class" in o and "module" in o
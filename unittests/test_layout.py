@@ -0,0 +1,63 @@
+import pytest
+
+from proxy import layout
+
+
+@pytest.mark.parametrize("n, columns, rows, expected", [
+    (0, 3, 3, []),
+    (2, 3, 3, [[[0, 1]]]),
+    (9, 3, 3, [[[0, 1, 2], [3, 4, 5], [6, 7, 8]]]),
+    (10, 3, 3, [[[0, 1, 2], [3, 4, 5], [6, 7, 8]], [[9]]]),
+    (5, 2, 1, [[[0, 1]], [[2, 3]], [[4]]]),
+])
+def test_plan_pages(n, columns, rows, expected):
+    assert list(layout.plan_pages(range(n), columns, rows)) == expected
+
+
+def test_plan_pages_no_fit():
+    with pytest.raises(ValueError):
+        list(layout.plan_pages(range(3), 0, 3))
+
+
+@pytest.mark.parametrize("previous, counts, expected", [
+    ("aabbcc", {"a": 2, "b": 2, "c": 2}, "aabbcc"),
+    ("aabbcc", {"a": 2, "c": 2, "d": 2}, "aaddcc"),
+    ("aabbcc", {"a": 2, "c": 2}, "aacc"),
+    ("aabbccdd", {"a": 2, "c": 2, "d": 2}, "aaddcc"),
+    ("aabb", {"a": 2, "b": 2, "c": 1}, "aabbc"),
+    ("", {"a": 1, "b": 2}, "abb"),
+])
+def test_stable_cells(previous, counts, expected):
+    assert "".join(layout.stable_cells(list(previous), counts)) == expected
+
+
+@pytest.mark.parametrize("width, height, cut, card", [
+    (210, 297, 0, (60, 85)),
+    (297, 420, 0.5, (60, 85)),
+    (215.9, 279.4, 1, (60, 85)),
+    (210, 297, 0, (86, 124)),
+])
+def test_best_sheet_layout_uniform_is_grid(width, height, cut, card):
+    sheet = layout.best_sheet_layout(width, height, (5, 5), cut, card)
+    assert not sheet.mixed
+    assert len(set(sheet.row_sizes)) == 1
+
+
+@pytest.mark.parametrize("width, height, cut, card", [
+    (210, 297, 0, (60, 85)),
+    (297, 420, 0.5, (60, 85)),
+    (215.9, 279.4, 1, (60, 85)),
+    (210, 297, 0, (86, 124)),
+])
+def test_best_sheet_layout_mixed_not_worse(width, height, cut, card):
+    uniform = layout.best_sheet_layout(width, height, (5, 5), cut, card)
+    mixed = layout.best_sheet_layout(width, height, (5, 5), cut, card, True)
+    assert mixed.capacity >= uniform.capacity
+    if mixed.capacity == uniform.capacity:
+        assert mixed == uniform
+
+
+def test_best_sheet_layout_mixed_a3():
+    sheet = layout.best_sheet_layout(297, 420, (5, 5), 0, (60, 85), True)
+    assert sheet.capacity == 20
+    assert sheet.mixed
@@ -0,0 +1,33 @@
+import io
+
+import pytest
+
+import card
+import load_file
+
+CSV_DECK = "Count,Name,Edition,Section\n4,Lightning Bolt,Magic 2010,main\n2,Island,,sideboard\n"
+XMAGE_DECK = "NAME:test\n4 [M10:146] Lightning Bolt\nSB: 2 [M11:1] Island\n"
+
+
+class NonSeekable(io.StringIO):
+    def seekable(self):
+        return False
+
+
+@pytest.mark.parametrize("text", [CSV_DECK, XMAGE_DECK])
+def test_iterate_matches_read(text):
+    main, side = load_file.read_any_file(io.StringIO(text))
+    iterfunc, readfunc, stream = load_file.sniff_stream(NonSeekable(text))
+    rows = list(iterfunc(stream))
+    assert [(c, n) for c, n, s in rows if s] == list(main)
+    assert [(c, n) for c, n, s in rows if not s] == list(side)
+
+
+def test_sniff_stream_replays_sample():
+    names = ["card " + a + b for a in "abcdefghij" for b in "abcdefghij"]
+    text = "".join("{0} {1}\n".format(i, name) for i, name in enumerate(names, 1))
+    iterfunc, readfunc, stream = load_file.sniff_stream(NonSeekable(text))
+    rows = list(iterfunc(stream))
+    assert len(rows) == 100
+    assert rows[0] == (card.Card("card aa", ""), 1, True)
+    assert rows[-1] == (card.Card("card jj", ""), 100, True)
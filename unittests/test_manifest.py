@@ -0,0 +1,34 @@
+import os
+
+import pytest
+
+import load_file
+from UI_Handler import manifest_main
+
+
+def test_deck_entries_merge_and_resolve_paths():
+    manifest = {"inventory": ["inv.csv", "/abs/inv2.csv"],
+                "paper": ["a4paper", "a3paper"],
+                "include-basics": True,
+                "decks": [{"input": "decks/a.txt", "output": "out/a.pdf"},
+                          {"input": "decks/b.txt", "output": "out/b.tex", "include_basics": False}]}
+    a, b = manifest_main.deck_entries(manifest, "/league")
+    assert a["inventory"] == "{0};/abs/inv2.csv".format(os.path.normpath("/league/inv.csv"))
+    assert a["paper"] == "a4paper;a3paper"
+    assert a["figures"] == os.path.normpath("/league/images")
+    assert a["include_basics"] is True
+    assert b["include_basics"] is False
+    assert b["output"] == os.path.normpath("/league/out/b.tex")
+
+
+def test_deck_entries_need_output():
+    with pytest.raises(ValueError):
+        manifest_main.deck_entries({"decks": ["a.txt"]}, "/league")
+
+
+def test_deck_cache_loads_once(tmpdir):
+    fname = str(tmpdir.join("deck.txt"))
+    with open(fname, "w") as f:
+        f.write("4 Lightning Bolt\n")
+    cache = manifest_main.DeckCache()
+    assert cache(fname, load_file.read_txt) is cache(fname, load_file.read_txt)
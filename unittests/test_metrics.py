@@ -0,0 +1,51 @@
+import card_downloader
+import metrics
+
+
+def test_prometheus_text():
+    m = metrics.Metrics(descriptions={"page_requests_total": "Pages requested"})
+    m.inc("page_requests_total")
+    m.inc("page_requests_total", 2)
+    for v in (0.001, 0.01, 0.3, 20):
+        m.observe("parse_seconds", v)
+    lines = m.to_prometheus().splitlines()
+    assert lines[:3] == ["# HELP proxybuilder_page_requests_total Pages requested",
+                         "# TYPE proxybuilder_page_requests_total counter",
+                         "proxybuilder_page_requests_total 3"]
+    assert "# TYPE proxybuilder_parse_seconds histogram" in lines
+    assert 'proxybuilder_parse_seconds_bucket{le="0.005"} 1' in lines
+    assert 'proxybuilder_parse_seconds_bucket{le="0.01"} 2' in lines
+    assert 'proxybuilder_parse_seconds_bucket{le="10"} 3' in lines
+    assert 'proxybuilder_parse_seconds_bucket{le="+Inf"} 4' in lines
+    assert "proxybuilder_parse_seconds_count 4" in lines
+
+
+class FakeResponse:
+    url = "http://example/query"
+    content = b"<html></html>"
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeSession:
+    def __init__(self):
+        self.calls = 0
+
+    def get(self, url, params=None, **kwargs):
+        self.calls += 1
+        return FakeResponse()
+
+
+def test_page_cache_counters():
+    downloader = card_downloader.CardDownloader()
+    downloader.session = FakeSession()
+    for _ in range(3):
+        downloader.load_magic_card("Lightning Bolt")
+    downloader.load_magic_card("Shock")
+    assert downloader.session.calls == 2
+    counters = downloader.metrics.snapshot()
+    assert counters["page_requests_total"] == 2
+    assert counters["page_cache_misses_total"] == 2
+    assert counters["page_cache_hits_total"] == 2
+    assert counters["page_bytes_total"] == 2 * len(FakeResponse.content)
@@ -0,0 +1,91 @@
+import json
+import logging
+
+import pytest
+
+import mylogger
+
+
+class Expensive:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return "expensive"
+
+
+class ListHandler(logging.Handler):
+    def __init__(self, level=logging.INFO):
+        super().__init__(level)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(self.format(record))
+
+
+@pytest.fixture
+def logger():
+    log = mylogger.Logger("test")
+    handler = ListHandler()
+    log.addHandler(handler)
+    log.handler = handler
+    return log
+
+
+def test_verbose_callable_not_called(logger):
+    expensive = Expensive()
+    logger.info("short", verbose_msg=expensive)
+    assert expensive.calls == 0
+    assert logger.handler.messages == ["short"]
+
+
+def test_callable_called_when_emitted(logger):
+    expensive = Expensive()
+    logger.verbose = True
+    logger.info(expensive, verbose_msg=expensive)
+    assert expensive.calls == 2
+    assert logger.handler.messages == ["expensive", "expensive"]
+
+
+def test_filtered_level_not_formatted(logger):
+    expensive = Expensive()
+    logger.debug(expensive)
+    assert expensive.calls == 0
+
+
+def test_deferred_args(logger):
+    logger.verbose = True
+    logger.warning("card %s", verbose_msg="removed %d times '%s'", msg_args=("bolt",),
+                   verbose_args=(2, "bolt"))
+    assert logger.handler.messages == ["card bolt", "removed 2 times 'bolt'"]
+
+
+def test_queue_logging_json_lines(tmpdir):
+    fname = str(tmpdir.join("log.jsonl"))
+    mylogger.start_queue_logging(fname)
+    try:
+        mylogger.MAINLOGGER.info("queued %s", verbose_msg="hidden", msg_args=(1,))
+        mylogger.MAINLOGGER.debug("not written")
+    finally:
+        mylogger.stop_queue_logging()
+    with open(fname) as f:
+        records = [json.loads(line) for line in f]
+    assert [(r["level"], r["message"]) for r in records] == [("INFO", "queued 1")]
+    assert mylogger.logging_handler_out in mylogger.MAINLOGGER.handlers
+
+
+def test_queue_logging_exception(tmpdir):
+    fname = str(tmpdir.join("log.jsonl"))
+    mylogger.start_queue_logging(fname)
+    try:
+        try:
+            raise KeyError("bolt")
+        except KeyError:
+            mylogger.MAINLOGGER.exception("lookup of %s failed", msg_args=("bolt",))
+    finally:
+        mylogger.stop_queue_logging()
+    with open(fname) as f:
+        record, = [json.loads(line) for line in f]
+    assert record["message"] == "lookup of bolt failed"
+    assert "KeyError: 'bolt'" in record["exception"]
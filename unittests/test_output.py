@@ -0,0 +1,44 @@
+import os
+
+import pytest
+
+from proxy import output
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _writer(n: int, changed: int = None) -> output.OutputLatex:
+    writer = output.OutputLatex("images")
+    writer.load_image_list({"card{0}{1}.jpg".format(i, "b" if i == changed else ""): 1 for i in range(n)})
+    return writer
+
+
+@pytest.fixture
+def root(monkeypatch):
+    # the templates are read from the working directory
+    monkeypatch.chdir(ROOT)
+
+
+def test_rebuild_rewrites_changed_shards(root, tmpdir):
+    fname = str(tmpdir.join("proxies.tex"))
+    writer = _writer(27)
+    shards = writer.write_shards(fname, "template.tex", 1)
+    assert [os.path.basename(s) for s in shards] == ["proxies-001.tex", "proxies-002.tex", "proxies-003.tex"]
+    for s in shards:
+        os.utime(s, (0, 0))
+
+    rebuilt = _writer(27, changed=26)
+    assert rebuilt.write_shards(fname, "template.tex", 1, previous_signatures=writer.shard_signatures) == shards
+    assert [os.path.getmtime(s) == 0 for s in shards] == [True, True, False]
+    assert "card26b" in tmpdir.join("proxies-003.tex").read()
+
+
+def test_smaller_rebuild_removes_stale_shards(root, tmpdir):
+    fname = str(tmpdir.join("proxies.tex"))
+    tmpdir.join("proxies-notes.tex").write("")
+    _writer(27).write_shards(fname, "template.tex", 1)
+    shards = _writer(10).write_shards(fname, "template.tex", 1)
+    assert sorted(f.basename for f in tmpdir.listdir()) == ["proxies-001.tex", "proxies-002.tex",
+                                                            "proxies-notes.tex", "proxies.tex"]
+    assert "proxies-003" not in tmpdir.join("proxies.tex").read()
+    assert len(shards) == 2
@@ -0,0 +1,39 @@
+import base64
+import re
+
+import pytest
+
+from proxy import output, pdf
+
+# 1x1 grayscale jpeg
+TINY_JPEG = base64.b64decode(
+    "/9j/4AAQSkZJRgABAQEASABIAAD/2wBDAP////////////////////////////////////////////////////////////"
+    "//////////////////////////wgALCAABAAEBAREA/8QAFBABAAAAAAAAAAAAAAAAAAAAAP/aAAgBAQABPxA=")
+
+
+@pytest.fixture
+def images(tmpdir):
+    for name in ("a", "b"):
+        tmpdir.join(name + ".jpg").write_binary(TINY_JPEG)
+    return tmpdir
+
+
+def test_jpeg_info(images):
+    assert pdf.jpeg_info(str(images.join("a.jpg"))) == (1, 1, 1)
+
+
+def test_pdf_pages_and_shared_images(images):
+    writer = output.OutputPDF("", cut_thickness=0.5)
+    writer.load_image_list({"a.jpg": 13, "b.jpg": 4})
+    target = images.join("out.pdf")
+    with open(str(target), "wb") as f:
+        writer(f)
+    data = target.read_binary()
+    per_page = writer.cardlayout[0] * writer.cardlayout[1]
+    assert len(re.findall(rb"/Type /Page ", data)) == -(-17 // per_page)
+    assert len(re.findall(rb"/Subtype /Image", data)) == 2
+    xref = int(re.search(rb"startxref\n(\d+)", data).group(1))
+    assert data[xref:].startswith(b"xref")
+    offsets = re.findall(rb"(\d{10}) 00000 n ", data[xref:])
+    for num, offset in enumerate(offsets, 1):
+        assert data[int(offset):].startswith("{0} 0 obj".format(num).encode())
@@ -0,0 +1,41 @@
+import io
+import pstats
+import time
+
+from UI_Handler import profiling
+
+
+def work(n):
+    return sorted(str(i) for i in range(n))
+
+
+def test_run_profiled(tmpdir):
+    fname = str(tmpdir.join("run.prof"))
+    out = io.StringIO()
+    assert profiling.run_profiled(work, 1000, fname, out=out) == work(1000)
+    assert "work" in out.getvalue()
+    assert pstats.Stats(fname).total_calls > 0
+
+
+def test_run_memory_profiled():
+    out = io.StringIO()
+    assert len(profiling.run_memory_profiled(work, 10000, top=3, out=out)) == 10000
+    lines = out.getvalue().splitlines()
+    assert lines[0].startswith("Peak traced memory")
+    assert len(lines) <= 5
+
+
+def peak_then_free(n):
+    # the temporaries making the peak are freed before the end
+    temporaries = [str(i) * 10 for i in range(n)]
+    time.sleep(0.2)
+    del temporaries
+    return n
+
+
+def test_memory_profile_sites_at_peak():
+    out = io.StringIO()
+    profiling.run_memory_profiled(peak_then_free, 100000, top=3, out=out, interval=0.01)
+    lines = out.getvalue().splitlines()
+    assert "highest sample" in lines[1]
+    assert "test_profiling.py" in lines[2]
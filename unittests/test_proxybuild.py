@@ -0,0 +1,30 @@
+import argparse
+
+import pytest
+
+import proxy.build_state as bs
+from UI_Handler import main
+from UI_Handler import proxybuild_main
+
+
+@pytest.mark.parametrize("card_size", ["standard", "60x85"])
+def test_layout_settings_survive_saved_state(tmpdir, card_size):
+    tmpdir.join("deck.txt").write("4 Lightning Bolt\n")
+    settings = main.setup_parser().parse_args(["proxy", str(tmpdir.join("deck.txt")), str(tmpdir.join("out.tex")),
+                                               "--card-size", card_size, "--incremental"])
+    fname = bs.state_filename(settings.output)
+    bs.save_build_state(fname, bs.BuildState(settings=proxybuild_main._layout_settings(settings)))
+    assert bs.load_build_state(fname).settings == proxybuild_main._layout_settings(settings)
+
+
+def test_card_size_argument():
+    assert main.card_size("oversized") == "oversized"
+    assert main.card_size("60x85.5") == (60.0, 85.5)
+    with pytest.raises(argparse.ArgumentTypeError, match="standard, oversized"):
+        main.card_size("huge")
+
+
+def test_unknown_card_size_fails_at_parsing(tmpdir):
+    with pytest.raises(argparse.ArgumentError, match="unknown card size 'huge'"):
+        main.setup_parser().parse_args(["proxy", str(tmpdir.join("deck.txt")), str(tmpdir.join("out.tex")),
+                                        "--card-size", "huge"])
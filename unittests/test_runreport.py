@@ -0,0 +1,36 @@
+import json
+
+import runreport
+
+
+def test_stages_add_up():
+    report = runreport.RunReport()
+    for _ in range(3):
+        with report.stage("load"):
+            sum(range(1000))
+    report.count("cards", 4)
+    report.count("cards")
+    d = report.to_json()
+    assert d["stages"]["load"]["calls"] == 3
+    assert d["stages"]["load"]["wall"] >= 0
+    assert d["counts"] == {"cards": 5}
+    assert "load" in report.summary()
+
+
+def test_stage_recorded_on_error():
+    report = runreport.RunReport()
+    try:
+        with report.stage("render"):
+            raise ValueError()
+    except ValueError:
+        pass
+    assert report.to_json()["stages"]["render"]["calls"] == 1
+
+
+def test_save(tmpdir):
+    report = runreport.RunReport()
+    report.count("http requests", 2)
+    fname = str(tmpdir.join("report.json"))
+    report.save(fname)
+    with open(fname) as f:
+        assert json.load(f)["counts"] == {"http requests": 2}
@@ -0,0 +1,49 @@
+import io
+import threading
+
+from card import Card
+import card_downloader
+import save_file
+
+
+class FakeDownloader:
+    """
+    Answers every lookup with a record listing the printings of `PRINTINGS`, first the asked edition.
+    """
+    PRINTINGS = {"lightning bolt": ["/pca/en/33.html", "/m10/en/146.html"],
+                 "island": ["/m11/en/230.html"]}
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.lookups = []
+
+    def load_card_record(self, name=None, edition=None, collectors_number=None, language=None):
+        with self.lock:
+            self.lookups.append((name, edition, collectors_number, language))
+        urls = self.PRINTINGS[name]
+        if edition:
+            urls = sorted(urls, key=lambda url: url.split("/")[1] != edition)
+        return card_downloader.CardRecord(name.title(), urls)
+
+
+def test_repeated_cards_looked_up_once():
+    session = FakeDownloader()
+    cards = [Card("island"), Card("island"), Card("lightning bolt", "m10", 146), Card("island")]
+    resolved = save_file.resolve_xmage_cards(cards, session)
+    assert resolved == {Card("island"): Card("island", "m11", 230, "en")}
+    assert len(session.lookups) == 1
+
+
+def test_unsupported_set_falls_back():
+    session = FakeDownloader()
+    resolved = save_file.resolve_xmage_cards([Card("lightning bolt", "pca", 33)], session)
+    assert resolved[Card("lightning bolt", "pca", 33)] == Card("lightning bolt", "m10", 146, "en")
+
+
+def test_save_xmage_writes_resolved_cards():
+    session = FakeDownloader()
+    out = io.StringIO()
+    save_file.save_xmage(out, [(Card("lightning bolt", "pca", 33), 4)], [(Card("island"), 2)],
+                         name="test", session=session)
+    assert out.getvalue() == "NAME:test\n4 [M10:146] lightning bolt\nSB: 2 [M11:230] island\n"
+    assert len(session.lookups) == 2
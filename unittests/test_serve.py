@@ -0,0 +1,128 @@
+import importlib
+import json
+import logging
+import os
+import socket
+import socketserver
+import stat
+import threading
+
+import pytest
+
+from UI_Handler import main
+from UI_Handler import profiling
+from UI_Handler import serve_main
+
+
+@pytest.fixture
+def server(tmpdir):
+    srv = serve_main.make_server(main.setup_parser, main.run_command, socket_path=str(tmpdir.join("jobs.sock")))
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_export_job(server, tmpdir):
+    tmpdir.join("deck.txt").write("4 Lightning Bolt\n2 Island\n")
+    response = serve_main.send_job(["export", "deck.txt", "out.txt"], socket_path=server.server_address,
+                                   cwd=str(tmpdir))
+    assert response["status"] == 0
+    assert "lightning bolt" in tmpdir.join("out.txt").read().lower()
+    assert any("Exporting deck, done!" in msg for level, msg in response["log"])
+    assert os.getcwd() != str(tmpdir)
+
+
+def test_bad_job(server, tmpdir):
+    response = serve_main.send_job(["serve"], socket_path=server.server_address, cwd=str(tmpdir))
+    assert response["status"] == 1
+    assert "serve" in response["error"]
+
+
+@pytest.mark.parametrize("argv", [["export", "-", "out.txt"], ["export", "deck.txt", "-"]])
+def test_stdio_job_rejected(server, tmpdir, argv):
+    tmpdir.join("deck.txt").write("4 Lightning Bolt\n")
+    response = serve_main.send_job(argv, socket_path=server.server_address, cwd=str(tmpdir))
+    assert response["status"] == 1
+    assert "stdin or write stdout" in response["error"]
+    assert not tmpdir.join("out.txt").check()
+
+
+def test_process_option_rejected(server, tmpdir):
+    tmpdir.join("deck.txt").write("4 Lightning Bolt\n")
+    response = serve_main.send_job(["--source", "http://localhost:1", "export", "deck.txt", "out.txt"],
+                                   socket_path=server.server_address, cwd=str(tmpdir))
+    assert response["status"] == 1
+    assert "--source" in response["error"]
+    assert not tmpdir.join("out.txt").check()
+
+
+def test_job_options(server, tmpdir):
+    tmpdir.join("deck.txt").write("4 Lightning Bolt\n")
+    response = serve_main.send_job(["--metrics", "metrics.prom", "--profile", "export", "deck.txt", "out.txt"],
+                                   socket_path=server.server_address, cwd=str(tmpdir))
+    assert response["status"] == 0
+    assert tmpdir.join("metrics.prom").check()
+    assert tmpdir.join(profiling.DEFAULT_PROFILE).check()
+    assert any(level == logging.WARNING and "Profile written" in msg for level, msg in response["log"])
+
+
+def test_running_server_not_replaced(server):
+    with pytest.raises(OSError, match="already running"):
+        serve_main.make_server(main.setup_parser, main.run_command, socket_path=server.server_address)
+    assert os.path.exists(server.server_address)
+
+
+def test_stale_socket_replaced(tmpdir):
+    path = str(tmpdir.join("stale.sock"))
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(path)
+    sock.close()
+    srv = serve_main.make_server(main.setup_parser, main.run_command, socket_path=path)
+    srv.server_close()
+
+
+def test_not_a_socket_kept(tmpdir):
+    tmpdir.join("file.sock").write("data")
+    with pytest.raises(FileExistsError):
+        serve_main.make_server(main.setup_parser, main.run_command, socket_path=str(tmpdir.join("file.sock")))
+    assert tmpdir.join("file.sock").read() == "data"
+
+
+def test_tcp_token(tmpdir):
+    tmpdir.join("deck.txt").write("4 Lightning Bolt\n")
+    srv = serve_main.make_server(main.setup_parser, main.run_command, port=0)
+    port = srv.server_address[1]
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    try:
+        token_file = serve_main.token_path(port)
+        assert stat.S_IMODE(os.stat(token_file).st_mode) == 0o600
+        response = serve_main.send_job(["export", "deck.txt", "out.txt"], port=port, cwd=str(tmpdir))
+        assert response["status"] == 0
+        with socket.create_connection(("127.0.0.1", port)) as sock, sock.makefile("rwb") as f:
+            f.write((json.dumps({"argv": ["export", "deck.txt", "out2.txt"], "cwd": str(tmpdir),
+                                 "token": "guess"}) + "\n").encode("utf-8"))
+            f.flush()
+            response = json.loads(f.readline().decode("utf-8"))
+        assert response["status"] == 1
+        assert "token" in response["error"]
+        assert not tmpdir.join("out2.txt").check()
+    finally:
+        srv.shutdown()
+        srv.server_close()
+    assert not os.path.exists(token_file)
+
+
+def test_tcp_without_unix_sockets(monkeypatch):
+    try:
+        with monkeypatch.context() as m:
+            m.delattr(socket, "AF_UNIX")
+            m.delattr(socketserver, "ThreadingUnixStreamServer")
+            module = importlib.reload(serve_main)
+            srv = module.make_server(main.setup_parser, main.run_command, port=0)
+            srv.server_close()
+            with pytest.raises(ValueError, match="--port"):
+                module.make_server(main.setup_parser, main.run_command, socket_path="jobs.sock")
+    finally:
+        importlib.reload(serve_main)
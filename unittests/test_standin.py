@@ -0,0 +1,109 @@
+import pytest
+import requests
+
+import card
+import card_downloader
+import deck
+from benchmarks import pages, standin
+from proxy import image_downloader
+
+NAMES = ["Lightning Bolt", "Fire // Ice", "Llanowar Elves"]
+
+
+@pytest.fixture
+def corpus(tmpdir):
+    index = standin.write_corpus(str(tmpdir.join("corpus")), NAMES, max_editions=3)
+    return str(tmpdir.join("corpus")), index
+
+
+@pytest.fixture
+def server(corpus):
+    srv = standin.start_server(corpus[0])
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_lookup_by_name(server, corpus):
+    session = card_downloader.CardDownloader(server.url)
+    analyzer = session.make_html_analyzer("fire // ice")
+    assert analyzer.get_main_name() == "Fire // Ice"
+    assert {e[0] for e in analyzer.get_all_editions()} == set(corpus[1]["fire // ice"])
+
+
+def test_lookup_by_edition(server, corpus):
+    session = card_downloader.CardDownloader(server.url)
+    edition = sorted(corpus[1]["lightning bolt"])[-1]
+    analyzer = session.make_html_analyzer("lightning bolt", edition)
+    assert analyzer.get_main_edition_link().split("/")[1] == edition
+
+
+def test_unknown_card(server):
+    session = card_downloader.CardDownloader(server.url)
+    with pytest.raises(ValueError):
+        session.make_html_analyzer("black lotus")
+
+
+def test_special_card_number_retry(server, corpus):
+    standin._write(corpus[0], "tst/en/12.html", standin.NO_MATCH_PAGE.encode("utf-8"))
+    standin._write(corpus[0], "tst/en/12a.html",
+                   pages.card_page("Fire // Ice", editions=[("tst", "Test", "12a")]).encode("utf-8"))
+    session = card_downloader.CardDownloader(server.url)
+    analyzer = session.make_html_analyzer("fire // ice", "tst", "12", "en")
+    assert analyzer.get_main_edition_link() == "/tst/en/12a.html"
+    assert session.metrics.counter("retries_total") == 1
+
+
+def test_faults(corpus):
+    srv = standin.start_server(corpus[0], error_rate=0.5, not_found_rate=0.5)
+    try:
+        session = card_downloader.CardDownloader(srv.url)
+        statuses = set()
+        for i in range(20):
+            with pytest.raises(requests.exceptions.HTTPError) as e:
+                session.load_magic_card("lightning bolt", collectors_number=str(i))
+            statuses.add(e.value.response.status_code)
+        assert statuses == {404, 503}
+    finally:
+        srv.shutdown()
+        srv.server_close()
+
+
+def test_download_images(server, tmpdir):
+    session = card_downloader.CardDownloader(server.url)
+    dck = deck.Deck({card.Card(name.lower()): 1 for name in NAMES + ["Black Lotus"]})
+    outnames = image_downloader.get_all_images(dck, str(tmpdir.join("images")), session)
+    assert len(outnames) == 3
+    assert tmpdir.join("images", outnames[card.Card("llanowar elves")]).read_binary() == standin.FAKE_SCAN
+    assert session.metrics.counter("scan_downloads_total") == 3
+
+
+def test_split_query():
+    assert standin.split_query('Fire / Ice e:"apc"/en') == ("fire // ice", "apc")
+    assert standin.split_query("Lightning Bolt") == ("lightning bolt", None)
+
+
+def test_parse_processes(server, tmpdir):
+    session = card_downloader.CardDownloader(server.url, parse_processes=2)
+    try:
+        record = session.load_card_record("llanowar elves")
+        assert record.get_main_name() == "Llanowar Elves"
+        with pytest.raises(ValueError):
+            session.load_card_record("black lotus")
+        dck = deck.Deck({card.Card(name.lower()): 1 for name in NAMES})
+        assert len(image_downloader.get_all_images(dck, str(tmpdir.join("images")), session)) == 3
+    finally:
+        session.close()
+    assert session._parse_pool is None
+
+
+def test_relative_corpus(corpus, tmpdir, monkeypatch):
+    monkeypatch.chdir(str(tmpdir))
+    srv = standin.start_server("corpus")
+    try:
+        analyzer = card_downloader.CardDownloader(srv.url).make_html_analyzer("llanowar elves")
+        assert analyzer.get_main_name() == "Llanowar Elves"
+        assert requests.get(srv.url + "/../../etc/passwd").status_code == 404
+    finally:
+        srv.shutdown()
+        srv.server_close()
@@ -0,0 +1,35 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("requests", "bs4", "html5lib", "jinja2")
+
+SCRIPT = """
+import sys
+import UI_Handler.main as main
+try:
+    main.setup_parser().parse_args({0!r})
+except SystemExit:
+    pass
+print("\\n" + " ".join(m for m in {1!r} if m in sys.modules))
+"""
+
+
+def imported_heavy_modules(argv):
+    out = subprocess.run([sys.executable, "-c", SCRIPT.format(argv, HEAVY_MODULES)],
+                         cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                         universal_newlines=True, check=True).stdout
+    return out.splitlines()[-1].split()
+
+
+@pytest.mark.parametrize("argv", [
+    ["-h"],
+    ["export", "-h"],
+    ["proxy", "-h"],
+    ["export", "deck.txt", "deck.json"],
+])
+def test_startup_skips_heavy_modules(argv):
+    assert imported_heavy_modules(argv) == []